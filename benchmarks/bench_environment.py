@@ -0,0 +1,46 @@
+"""Compares the chained Environment with one that copies all bindings on every extension.
+
+Run with: python3 -m benchmarks.bench_environment
+"""
+import timeit
+from typing import Dict
+
+from jinsi import compile_string
+from jinsi.environment import Environment
+from jinsi.value import Value
+
+TEMPLATE = """\
+items:
+  ::each $items as $item:
+    name: <<$item>>
+    first: <<$arg0>>
+"""
+
+
+class CopyingEnvironment(Environment):
+    """The previous implementation: every extension copies every binding of the parent."""
+
+    def with_env(self, env: Dict[str, Value]) -> Environment:
+        new_env = CopyingEnvironment.__new__(CopyingEnvironment)
+        new_env.memo = self.memo
+        new_env.parent = None
+        new_env.depth = 0
+        new_env.dyn = {}
+        for key, value in self.dyn.items():
+            new_env.dyn[key] = value
+        for key, value in env.items():
+            new_env.dyn[key] = value
+        return new_env
+
+
+def main(*, items: int = 10_000, args: int = 1_000, number: int = 3):
+    node, = compile_string(TEMPLATE).documents
+    bindings = {f"arg{i}": f"value{i}" for i in range(args)}
+    bindings['items'] = [f"item{i}" for i in range(items)]
+    for cls in (CopyingEnvironment, Environment):
+        seconds = timeit.timeit(lambda: node.evaluate(cls(**bindings)), number=number) / number
+        print(f"{cls.__name__:<20} {items} items, {args} args: {seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
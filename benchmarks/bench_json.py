@@ -0,0 +1,45 @@
+"""Compares the pure-Python JSON encoder with the fast path that delegates to the C encoder.
+
+Run with: python3 -m benchmarks.bench_json
+"""
+import datetime
+import timeit
+from decimal import Decimal
+
+from jinsi.jsonutil import Encoder, dumpjson
+
+
+def document(size: int, *, arithmetic: bool = False):
+    """A list of items, with `arithmetic` some prices are computed like `<<price * 1.10>>` would be, which
+    leaves trailing zeros no float renders."""
+    return {
+        'items': [
+            {
+                'name': f"item{i}",
+                'index': i,
+                'price': Decimal(f"{i}.25") * Decimal('1.10') if arithmetic and i % 10 == 0 else Decimal(f"{i}.25"),
+                'created': datetime.date(2020, 1, 1 + i % 28),
+                'tags': ['a', 'b', 'c'],
+                'enabled': i % 2 == 0,
+                'parent': None,
+            }
+            for i in range(size)
+        ],
+    }
+
+
+def main(*, size: int = 10_000, number: int = 5):
+    for arithmetic in (False, True):
+        doc = document(size, arithmetic=arithmetic)
+        assert "".join(Encoder().iterencode(doc)) == dumpjson(doc)
+        label = "with arithmetic" if arithmetic else "items"
+        for name, func in (
+                ('python', lambda: "".join(Encoder().iterencode(doc))),
+                ('c', lambda: dumpjson(doc)),
+        ):
+            seconds = timeit.timeit(func, number=number) / number
+            print(f"{name:<10} {size} {label:<15}: {seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
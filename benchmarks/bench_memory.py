@@ -0,0 +1,90 @@
+"""Measures the memory taken by the nodes of a large compiled template.
+
+Run with: python3 -m benchmarks.bench_memory [N]
+
+The node tree is rebuilt twice, once from the node classes themselves and once from subclasses which
+carry an instance `__dict__` and an `is_empty` attribute, as nodes did before they used `__slots__`.
+"""
+import sys
+import tracemalloc
+from typing import Dict, Tuple
+
+from jinsi import compile_string
+from jinsi.nodes import Empty, Node
+
+from .suite import cloudformation
+
+_dict_classes: Dict[type, type] = {}
+
+
+def dict_class(cls: type) -> type:
+    """A subclass of a node class whose instances have a `__dict__`."""
+    if cls not in _dict_classes:
+        _dict_classes[cls] = type(cls.__name__, (cls,), {})
+    return _dict_classes[cls]
+
+
+def slot_names(cls: type) -> Tuple[str, ...]:
+    return tuple(
+        name for klass in cls.__mro__ for name in getattr(klass, '__slots__', ())
+        if name != '__weakref__'
+    )
+
+
+def rebuild(node: Node, *, with_dict: bool, memo: Dict[int, Node]) -> Node:
+    if isinstance(node, Empty):
+        return node
+    if id(node) in memo:
+        return memo[id(node)]
+    cls = dict_class(type(node)) if with_dict else type(node)
+    new = object.__new__(cls)
+    memo[id(node)] = new
+    if with_dict:
+        new.is_empty = False
+    for name in slot_names(type(node)):
+        value = getattr(node, name)
+        if name != 'value':
+            value = _rebuild_value(value, with_dict=with_dict, memo=memo)
+        setattr(new, name, value)
+    return new
+
+
+def _rebuild_value(value, *, with_dict: bool, memo: Dict[int, Node]):
+    if isinstance(value, Node):
+        return rebuild(value, with_dict=with_dict, memo=memo)
+    if isinstance(value, list):
+        return [_rebuild_value(item, with_dict=with_dict, memo=memo) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_rebuild_value(item, with_dict=with_dict, memo=memo) for item in value)
+    if isinstance(value, dict):
+        return {key: _rebuild_value(item, with_dict=with_dict, memo=memo) for key, item in value.items()}
+    return value
+
+
+def measure(documents, *, with_dict: bool) -> Tuple[int, int]:
+    """The number of nodes and the bytes allocated for rebuilding them."""
+    tracemalloc.start()
+    try:
+        memo: Dict[int, Node] = {}
+        copies = [rebuild(document, with_dict=with_dict, memo=memo) for document in documents]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del copies
+    return len(memo), size - sys.getsizeof(memo) - sum(sys.getsizeof(key) for key in memo)
+
+
+def main(n: int = 1_000):
+    text, _ = cloudformation(n)
+    tracemalloc.start()
+    template = compile_string(text)
+    compiled, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"compiled template ({n} resources): {compiled / 1024:10.1f} KiB")
+    for with_dict, label in ((True, "nodes with __dict__"), (False, "nodes with __slots__")):
+        count, size = measure(template.documents, with_dict=with_dict)
+        print(f"{label:<34} {size / 1024:10.1f} KiB, {count} nodes, {size / count:6.1f} bytes per node")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,143 @@
+"""Times representative workloads, reporting parse, evaluate and serialize phases separately.
+
+Run with: python3 -m benchmarks.suite [-n REPEAT] [NAME...]
+
+NAME selects workloads whose name contains it. Each phase reports the best of REPEAT runs:
+
+    parse      YAML text to compiled template (includes constant folding)
+    evaluate   template to values
+    closure    template to values, with the closure engine (compiled once, before timing)
+    json/yaml  values to JSON lines / YAML documents
+"""
+import sys
+import textwrap
+import timeit
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from jinsi import compile_string
+from jinsi.jsonutil import dumpjson
+from jinsi.yamlutil import dumpyaml
+
+Workload = Tuple[str, Dict]
+
+
+def fibonacci(n: int) -> Workload:
+    with open("examples/fibonacci.yaml") as f:
+        return f.read(), {'max': n}
+
+
+def wide_each(n: int) -> Workload:
+    return textwrap.dedent("""\
+        ::let:
+          item:
+            name: <<$item.name>>
+            labels:
+              app: <<$app>>
+              index: <<$item.index>>
+        items:
+          ::each $items as $item:
+            ::call: item
+    """), {'app': 'bench', 'items': [{'name': f"item{i}", 'index': i} for i in range(n)]}
+
+
+def deep_let(depth: int) -> Workload:
+    lines = ["::let:", "  v0: <<$x>>"]
+    indent = ""
+    for i in range(1, depth + 1):
+        lines.append(f"{indent}level{i}:")
+        indent += "  "
+        lines.append(f"{indent}::let:")
+        lines.append(f"{indent}  v{i}: <<v{i - 1}>>.{i}")
+        lines.append(f"{indent}value: <<v{i}>>")
+    return "\n".join(lines) + "\n", {'x': 'root'}
+
+
+def formatting(n: int) -> Workload:
+    return textwrap.dedent("""\
+        ::let:
+          host: <<$service>>.<<$namespace>>.svc.cluster.local
+          url: https://<<host>>:<<$port>>/<<$path>>
+        urls:
+          ::each $paths as $path:
+            url: <<url>>
+            description: <<$service>> serves <<$path>> on <<host>> port <<$port>>
+            <<$service>>-<<$path>>: <<url>>?source=<<$namespace>>
+    """), {'service': 'api', 'namespace': 'prod', 'port': 443, 'paths': [f"path{i}" for i in range(n)]}
+
+
+def cloudformation(n: int) -> Workload:
+    resources = []
+    for i in range(n):
+        resources.append(textwrap.indent(textwrap.dedent(f"""\
+            Bucket{i}:
+              Type: AWS::S3::Bucket
+              Properties:
+                BucketName: !Sub '<<$prefix>>-{i}-${{AWS::Region}}'
+                Tags:
+                  - Key: Name
+                    Value: <<$prefix>>-{i}
+            Policy{i}:
+              Type: AWS::S3::BucketPolicy
+              Properties:
+                Bucket: !Ref Bucket{i}
+                PolicyDocument:
+                  Statement:
+                    - Effect: Allow
+                      Resource: !GetAtt Bucket{i}.Arn
+                      Principal: <<$principal>>
+        """), "  "))
+    return "Resources:\n" + "".join(resources), {'prefix': 'bench', 'principal': '*'}
+
+
+WORKLOADS: Dict[str, Callable[[], Workload]] = {
+    'fibonacci-20': lambda: fibonacci(20),
+    'fibonacci-90': lambda: fibonacci(90),
+    'each-10k': lambda: wide_each(10_000),
+    'each-100k': lambda: wide_each(100_000),
+    'let-depth-100': lambda: deep_let(100),
+    'format-10k': lambda: formatting(10_000),
+    'cloudformation-1k': lambda: cloudformation(1_000),
+}
+
+PHASES = ('parse', 'evaluate', 'closure', 'json', 'yaml')
+
+
+def best(func: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def measure(text: str, args: Dict, *, repeat: int) -> Iterator[float]:
+    template = compile_string(text)
+    values = list(template.evaluate(args=args))
+    closures = compile_string(text, engine="closure")
+    list(closures.evaluate(args=args))
+    yield best(lambda: compile_string(text), repeat)
+    yield best(lambda: list(template.evaluate(args=args)), repeat)
+    yield best(lambda: list(closures.evaluate(args=args)), repeat)
+    yield best(lambda: [dumpjson(value) for value in values], repeat)
+    yield best(lambda: [dumpyaml(value) for value in values], repeat)
+
+
+def main(argv: List[str]):
+    repeat = 3
+    names = []
+    args_it = iter(argv)
+    for arg in args_it:
+        if arg in ("-n", "--repeat"):
+            repeat = int(next(args_it))
+        else:
+            names.append(arg)
+    print(f"{'workload':<20}" + "".join(f"{phase:>12}" for phase in PHASES))
+    for name, workload in WORKLOADS.items():
+        if names and not any(n in name for n in names):
+            continue
+        text, args = workload()
+        timings = measure(text, args, repeat=repeat)
+        print(f"{name:<20}", end="", flush=True)
+        for seconds in timings:
+            print(f"{seconds * 1000:9.2f} ms", end="", flush=True)
+        print()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
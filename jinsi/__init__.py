@@ -1,25 +1,45 @@
 from .__pkginfo__ import version as __version__
 from .api import \
+    compile_file, \
+    compile_string, \
+    iterload_file, \
+    iterload_string, \
     load_file, \
     load_string, \
     load1f, \
     load1s, \
     render_file, \
+    render_file_into, \
+    render_many, \
     render_string, \
+    render_string_into, \
     render1f, \
     render1s
 from .functions import Functions
-from .jsonutil import loadjson, loadjson_all, dumpjson
+from .session import RenderSession
+from .template import CompiledTemplate
+from .jsonutil import loadjson, loadjson_all, dumpjson, dumpjson_into
 from .util import cached_method, cached_function
-from .yamlutil import loadyaml, loadyaml_all, dumpyaml
+from .writer import DocumentWriter
+from .yamlutil import loadyaml, loadyaml_all, dumpyaml, dumpyaml_into
 
 __all__ = [
+    'compile_file',
+    'compile_string',
+    'CompiledTemplate',
+    'RenderSession',
+
+    'iterload_file',
+    'iterload_string',
     'load_file',
     'load_string',
     'load1f',
     'load1s',
     'render_file',
+    'render_file_into',
+    'render_many',
     'render_string',
+    'render_string_into',
     'render1f',
     'render1s',
 
@@ -28,8 +48,12 @@ __all__ = [
     'loadjson',
     'loadjson_all',
     'dumpjson',
+    'dumpjson_into',
 
     'loadyaml',
     'loadyaml_all',
     'dumpyaml',
+    'dumpyaml_into',
+
+    'DocumentWriter',
 ]
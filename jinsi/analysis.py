@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Hashable, Iterable, Optional
+from weakref import WeakKeyDictionary
+
+from .nodes import *
+
+
+class Dependencies:
+    """The free variables a node reads when it is evaluated.
+
+    `dyn` holds the names of dynamic (`$`) variables, `env` the names of environment variables.
+    A loop variable of an `::each` without `$` is recorded as the `Each` node itself, which is
+    the key the loop binds it under in the environment."""
+
+    __slots__ = ('dyn', 'env')
+
+    def __init__(self, dyn: Iterable[Hashable] = (), env: Iterable[str] = ()):
+        self.dyn: FrozenSet[Hashable] = frozenset(dyn)
+        self.env: FrozenSet[str] = frozenset(env)
+
+    def __eq__(self, other):
+        return isinstance(other, Dependencies) and self.dyn == other.dyn and self.env == other.env
+
+    def __hash__(self):
+        return hash((self.dyn, self.env))
+
+    def __repr__(self):
+        return f"Dependencies(dyn={set(self.dyn)!r}, env={set(self.env)!r})"
+
+    @property
+    def args(self) -> FrozenSet[str]:
+        """The names of the `$` variables read, without loop variables of enclosing `::each` nodes."""
+        return frozenset(name for name in self.dyn if isinstance(name, str))
+
+    def __or__(self, other: Dependencies) -> Dependencies:
+        if not other.dyn and not other.env:
+            return self
+        return Dependencies(self.dyn | other.dyn, self.env | other.env)
+
+    def without(self, names: Iterable[Hashable]) -> Dependencies:
+        return Dependencies(self.dyn.difference(names), self.env)
+
+
+NONE = Dependencies()
+
+
+def resolve_let(node: Node, name: str) -> Optional[Node]:
+    """Statically find the node a `::let` name refers to from the given node, as `get_let` would.
+
+    Returns the `Each` node if the name refers to a loop variable and `None` if it is unbound."""
+    current = node
+    while not isinstance(current, Empty):
+        if isinstance(current, Let) and name in current.let:
+            return current.let[name]
+        if isinstance(current, Each) and current.target == name:
+            return current
+        current = current.parent
+    return None
+
+
+class Analysis:
+    """Computes the dependencies of nodes, following `::let` references and `::call`s.
+
+    Recursive templates are handled by iterating to a fixpoint."""
+
+    def __init__(self, cache: Dict[Node, Dependencies]):
+        self._cache = cache
+        self._assumptions: Dict[Node, Dependencies] = {}
+        self._assumed = 0
+
+    def dependencies(self, node: Node) -> Dependencies:
+        try:
+            return self._cache[node]
+        except KeyError:
+            pass
+        if node in self._assumptions:
+            self._assumed += 1
+            return self._assumptions[node]
+        self._assumptions[node] = NONE
+        assumed_before = self._assumed
+        while True:
+            self._assumed = assumed_before
+            result = self._compute(node)
+            if result == self._assumptions[node]:
+                break
+            self._assumptions[node] = result
+        del self._assumptions[node]
+        if self._assumed == assumed_before or not self._assumptions:
+            self._cache[node] = result
+        return result
+
+    def _let(self, node: Node, name: str) -> Dependencies:
+        target = resolve_let(node, name)
+        if target is None:
+            return NONE
+        if isinstance(target, Each):
+            return Dependencies(dyn=(target,))
+        return self.dependencies(target)
+
+    def _all(self, nodes: Iterable[Node]) -> Dependencies:
+        result = NONE
+        for node in nodes:
+            result = result | self.dependencies(node)
+        return result
+
+    def _compute(self, node: Node) -> Dependencies:
+        if isinstance(node, GetDyn):
+            return Dependencies(dyn=(node.path[0],))
+        if isinstance(node, GetEnvVar):
+            return Dependencies(env=(node.name,))
+        if isinstance(node, GetLet):
+            return self._let(node, node.path[0])
+        if isinstance(node, Format):
+            return self._all(part for part in node.parts if isinstance(part, Node))
+        if isinstance(node, Let):
+            return self._all(node.env.values()) | self.dependencies(node.body).without(node.env.keys())
+        if isinstance(node, Else):
+            return self.dependencies(node.body) | self.dependencies(node.otherwise)
+        if isinstance(node, Object):
+            return self._all(node.children.values()) | self._all(node.formats.values())
+        if isinstance(node, Sequence):
+            return self._all(node.elements)
+        if isinstance(node, FunctionApplication):
+            return self._all(node.args)
+        if isinstance(node, Application):
+            result = self._all(node.kwargs.values())
+            template = resolve_let(node, node.template)
+            if isinstance(template, Each):
+                return result | Dependencies(dyn=(template,))
+            if template is not None:
+                result = result | self.dependencies(template).without(node.kwargs.keys())
+            return result
+        if isinstance(node, Each):
+            if node.source[:1] == "$":
+                result = Dependencies(dyn=(node.source[1:],))
+            else:
+                result = self._let(node.parent, node.source)
+            if node.target[:1] == "$":
+                bound = (node.target[1:],)
+            else:
+                bound = ("", node)
+            return result | self.dependencies(node.body).without(bound)
+        if isinstance(node, When):
+            return self._all((node.when, node.then, node.else_))
+        if isinstance(node, (All, Any)):
+            return self._all(node.nodes)
+        if isinstance(node, Case):
+            result = NONE
+            for condition, action in node.cases:
+                result = result | self.dependencies(condition) | self.dependencies(action)
+            return result
+        if isinstance(node, Match):
+            return self.dependencies(node.condition) | self._all(node.values.values())
+        return NONE
+
+
+_dependencies: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def dependencies(node: Node) -> Dependencies:
+    """Return the variables the given node reads, computed once per node."""
+    try:
+        return _dependencies[node]
+    except KeyError:
+        return Analysis(_dependencies).dependencies(node)
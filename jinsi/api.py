@@ -1,46 +1,52 @@
+import itertools
+import sys
 import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from json.decoder import JSONDecodeError
-from typing import Dict, Iterator
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
 from yaml import YAMLError
 
-from .jsonutil import loadjson_all, dumpjson
+from .cache import get_cache
+from .jsonutil import loadjson_all
+from .locations import LocatingParser
 from .nodes import Constant, Empty, Node
-from .parser import Parser, Environment
-from .util import treat
+from .optimizer import fold_constants
+from .parser import Parser
+from .profiler import Profiler
+from .template import CompiledTemplate
+from .util import LRUCache
 from .value import Value
-from .yamlutil import dumpyaml, loadyaml_all
+from .yamlutil import loadyaml_all, loadyaml_all_marked, loadyaml_list
 
 
-def _evaluate(node: Node, *, args: Dict) -> Value:
-    return node.evaluate(env=Environment(**args))
-
-
-def _parse(doc: Value) -> Node:
+def _parse(doc: Value, parser: Optional[Parser] = None) -> Node:
     if not isinstance(doc, (list, dict)):
         return Constant(parent=Empty(), value=doc)
-    return Parser().parse_node(doc, parent=Empty())
+    if parser is None:
+        parser = Parser()
+    return fold_constants(parser.parse_node(doc, parent=Empty()), interned=parser.interned)
 
 
-def _parse_json(s: str) -> Iterator[Node]:
+def _parse_json(s: str, parser: Optional[Parser] = None) -> Iterator[Node]:
     docs = loadjson_all(s)
     for doc in docs:
-        yield _parse(doc)
+        yield _parse(doc, parser)
 
 
-def _parse_string(s: str) -> Iterator[Node]:
+def _parse_string(s: str, parser: Optional[Parser] = None) -> Iterator[Node]:
     s = textwrap.dedent(s)
     docs = loadyaml_all(s)
     count = 0
     try:
         for doc in docs:
             count += 1
-            yield _parse(doc)
+            yield _parse(doc, parser)
     except YAMLError as err:
         if count < 2:
             try:
                 skip = 0
-                it = _parse_json(s)
+                it = _parse_json(s, parser)
                 while skip < count:
                     skip += 1
                     next(it)
@@ -53,35 +59,172 @@ def _parse_string(s: str) -> Iterator[Node]:
 
 
 # noinspection PyShadowingBuiltins
-def _parse_file(path: str, *, _open) -> Iterator[Node]:
+def _parse_file(path: str, *, parser: Optional[Parser] = None, _open) -> Iterator[Node]:
+    cache = get_cache()
     with _open(path) as f:
-        docs = loadyaml_all(f)
+        if cache is None:
+            docs = loadyaml_all(f)
+        else:
+            docs = cache.load(f.read(), loadyaml_list)
         for doc in docs:
-            yield _parse(doc)
+            yield _parse(doc, parser)
 
 
-def _render(node: Node, *, args: Dict, as_json: bool) -> str:
-    value = _evaluate(node, args=args)
-    if as_json:
-        return dumpjson(value)
-    else:
-        return dumpyaml(value)
+def _compile_located(stream, *, source: Optional[str], engine: str = "tree") -> CompiledTemplate:
+    documents = []
+    locations = {}
+    includes = []
+    interned = {}
+    for doc, marks in loadyaml_all_marked(stream):
+        parser = LocatingParser(marks, file=source)
+        node = parser.parse_node(doc, parent=Empty())
+        documents.append(fold_constants(node, locations=parser.locations, interned=interned))
+        locations.update(parser.locations)
+        includes.extend(parser.includes)
+    return CompiledTemplate(documents, source=source, locations=locations, includes=includes, engine=engine)
+
+
+def compile_string(s: str, *, locations: bool = False, engine: str = "tree") -> CompiledTemplate:
+    """Parse all documents from a string into a template that can be rendered repeatedly.
 
+    With `locations`, the line and column each node was parsed from is recorded (which makes parsing slower).
+    The engine is "tree" or "closure", see `CompiledTemplate`."""
+    if locations:
+        try:
+            return _compile_located(textwrap.dedent(s), source=None, engine=engine)
+        except YAMLError:
+            pass
+    parser = Parser()
+    documents = list(_parse_string(s, parser))
+    return CompiledTemplate(documents, includes=parser.includes, engine=engine)
 
-def render_string(s: str, *, args: Dict = None, as_json: bool = False) -> Iterator[str]:
-    """Render each document from a string and return each rendered string one by one."""
-    if not args:
-        args = {}
-    for node in _parse_string(s):
-        yield _render(node, args=args, as_json=as_json)
 
+def compile_file(path: str, *, locations: bool = False, engine: str = "tree", _open=open) -> CompiledTemplate:
+    """Parse all documents from a file into a template that can be rendered repeatedly.
 
-def render_file(path: str, *, args: Dict = None, as_json: bool = False, _open=open) -> Iterator[str]:
-    """Render each document from a file and return each rendered string one by one."""
-    if not args:
-        args = {}
-    for node in _parse_file(path, _open=_open):
-        yield _render(node, args=args, as_json=as_json)
+    With `locations`, the line and column each node was parsed from is recorded (which makes parsing slower).
+    The engine is "tree" or "closure", see `CompiledTemplate`."""
+    if locations:
+        with _open(path) as f:
+            return _compile_located(f, source=path, engine=engine)
+    parser = Parser(source=path)
+    documents = list(_parse_file(path, parser=parser, _open=_open))
+    return CompiledTemplate(documents, source=path, includes=parser.includes, engine=engine)
+
+
+def _profiled(template: CompiledTemplate, run: Callable[[Optional[Profiler]], Iterator], profile: bool) -> Iterator:
+    if not profile:
+        return run(None)
+    return _run_profiled(template, run)
+
+
+def _run_profiled(template: CompiledTemplate, run: Callable[[Optional[Profiler]], Iterator]) -> Iterator:
+    profiler = template.profiler()
+    yield from run(profiler)
+    profiler.report(sys.stderr)
+
+
+def render_string(
+        s: str, *,
+        args: Dict = None,
+        as_json: bool = False,
+        profile: bool = False,
+        engine: str = "tree",
+) -> Iterator[str]:
+    """Render each document from a string and return each rendered string one by one.
+
+    With `profile`, a report of the slowest nodes is printed to stderr once all documents are rendered."""
+    template = compile_string(s, locations=profile, engine=engine)
+    return _profiled(template, lambda profiler: template.render(
+        args=args, as_json=as_json, profiler=profiler), profile)
+
+
+def render_file(
+        path: str, *,
+        args: Dict = None,
+        as_json: bool = False,
+        profile: bool = False,
+        engine: str = "tree",
+        _open=open,
+) -> Iterator[str]:
+    """Render each document from a file and return each rendered string one by one.
+
+    With `profile`, a report of the slowest nodes is printed to stderr once all documents are rendered."""
+    template = compile_file(path, locations=profile, engine=engine, _open=_open)
+    return _profiled(template, lambda profiler: template.render(
+        args=args, as_json=as_json, profiler=profiler), profile)
+
+
+def render_string_into(s: str, stream: TextIO, *, args: Dict = None, as_json: bool = False):
+    """Render all documents from a string directly into a text stream."""
+    compile_string(s).render_into(stream, args=args, as_json=as_json)
+
+
+def render_file_into(path: str, stream: TextIO, *, args: Dict = None, as_json: bool = False, _open=open):
+    """Render all documents from a file directly into a text stream."""
+    compile_file(path, _open=_open).render_into(stream, args=args, as_json=as_json)
+
+
+# the files compiled in this worker process, by path and engine
+_compiled = LRUCache(maxsize=16)
+
+
+def _compiled_file(path: str, engine: str) -> CompiledTemplate:
+    template = _compiled.get((path, engine))
+    if template is None:
+        template = compile_file(path, engine=engine)
+        _compiled.put((path, engine), template)
+    return template
+
+
+def _render_head(path: str, args: Dict, as_json: bool, engine: str) -> Tuple[int, List[str]]:
+    template = _compiled_file(path, engine)
+    return len(template), list(itertools.islice(template.render(args=args, as_json=as_json), 1))
+
+
+def _render_document(
+        source: Union[str, CompiledTemplate], ix: int, args: Dict, as_json: bool, engine: str,
+) -> str:
+    template = _compiled_file(source, engine) if isinstance(source, str) else source
+    return template.render_document(ix, args=args, as_json=as_json)
+
+
+def render_many(
+        sources: Iterable[Union[str, CompiledTemplate]], *,
+        args: Dict = None,
+        as_json: bool = False,
+        workers: Optional[int] = None,
+        engine: str = "tree",
+) -> Iterator[str]:
+    """Render each document from several files using a pool of processes and return each rendered string in order.
+
+    A source is either a path or an already compiled template, which is rendered with its own engine.
+    Each document is rendered by its own task. A worker parses a file the first time it renders one of its
+    documents, a compiled template is sent one document per task, and only the rendered strings are sent back."""
+    sources = list(sources)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        heads = [
+            executor.submit(_render_head, source, args, as_json, engine) if isinstance(source, str) else None
+            for source in sources
+        ]
+        parts = []
+        for source, head in zip(sources, heads):
+            if head is None:
+                parts.append(([], [
+                    executor.submit(_render_document, CompiledTemplate(
+                        [document], source=source.source, engine=source.engine), 0, args, as_json, engine)
+                    for document in source.documents
+                ]))
+            else:
+                # the first document is rendered with the count, by the worker which parsed the file already
+                count, first = head.result()
+                parts.append((first, [
+                    executor.submit(_render_document, source, ix, args, as_json, engine) for ix in range(1, count)
+                ]))
+        for first, rest in parts:
+            yield from first
+            for doc in rest:
+                yield doc.result()
 
 
 def _render1(it: Iterator[str], as_json: bool) -> str:
@@ -109,27 +252,44 @@ def render1f(path: str, *, args: Dict = None, as_json: bool = False) -> str:
     return _render1(render_file(path, args=args, as_json=as_json), as_json=as_json)
 
 
-def load_string(s: str, *, args: Dict = None, numtype: type = float) -> Iterator[Value]:
+def load_string(
+        s: str, *,
+        args: Dict = None,
+        numtype: type = float,
+        profile: bool = False,
+        engine: str = "tree",
+) -> Iterator[Value]:
     """Load all documents from a string."""
-    if not args:
-        args = {}
-    docs = loadyaml_all(textwrap.dedent(s))
-    for doc in docs:
-        node = _parse(doc)
-        value = _evaluate(node, args=args)
-        yield treat(value, numtype=numtype)
+    if profile:
+        template = _compile_located(textwrap.dedent(s), source=None, engine=engine)
+    else:
+        template = CompiledTemplate((_parse(doc) for doc in loadyaml_all(textwrap.dedent(s))), engine=engine)
+    return _profiled(template, lambda profiler: template.load(
+        args=args, numtype=numtype, profiler=profiler), profile)
+
+
+def load_file(
+        path: str, *,
+        args: Dict = None,
+        numtype: type = float,
+        profile: bool = False,
+        engine: str = "tree",
+        _open=open,
+) -> Iterator[Value]:
+    """Load all documents from a path."""
+    template = compile_file(path, locations=profile, engine=engine, _open=_open)
+    return _profiled(template, lambda profiler: template.load(
+        args=args, numtype=numtype, profiler=profiler), profile)
 
 
-def load_file(path: str, *, args: Dict = None, numtype: type = float, _open=open) -> Iterator[Value]:
-    """Load all documents from a path."""
-    if not args:
-        args = {}
-    with _open(path) as file:
-        docs = loadyaml_all(file)
-        for doc in docs:
-            node = _parse(doc)
-            value = _evaluate(node, args=args)
-            yield treat(value, numtype=numtype)
+def iterload_string(s: str, *, args: Dict = None, numtype: type = float) -> Iterator[Iterator[Value]]:
+    """Load all documents from a string lazily, see `CompiledTemplate.iterload`."""
+    return compile_string(s).iterload(args=args, numtype=numtype)
+
+
+def iterload_file(path: str, *, args: Dict = None, numtype: type = float, _open=open) -> Iterator[Iterator[Value]]:
+    """Load all documents from a path lazily, see `CompiledTemplate.iterload`."""
+    return compile_file(path, _open=_open).iterload(args=args, numtype=numtype)
 
 
 def load1s(s: str, *, args: Dict = None, numtype: type = float) -> Value:
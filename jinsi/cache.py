@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+from .__pkginfo__ import version
+from .value import Value
+
+CACHE_DIR_VARIABLE = 'JINSI_CACHE_DIR'
+
+
+class DocumentCache:
+    """Stores parsed documents on disk, keyed by a digest of the source text.
+
+    The cache directory is trusted: entries are pickles and are loaded as such."""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, version)
+
+    @staticmethod
+    def digest(text: str, *, salt: str = "") -> str:
+        md = hashlib.blake2b(digest_size=20)
+        md.update(salt.encode('utf8'))
+        md.update(b'\0')
+        md.update(text.encode('utf8'))
+        return md.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pickle")
+
+    def load(self, text: str, loader: Callable[[str], List[Value]]) -> List[Value]:
+        """Return the documents for the given text, calling loader only on a cache miss."""
+        key = self.digest(text, salt=f"{loader.__module__}.{loader.__qualname__}")
+        path = self.path(key)
+        # noinspection PyBroadException
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # unreadable, truncated or stale entries are replaced as if they were missing
+            pass
+        docs = loader(text)
+        self.store(path, docs)
+        return docs
+
+    @staticmethod
+    def store(path: str, docs: List[Value]):
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(docs, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            # the cache is an optimization only, failing to write it must not fail rendering
+            pass
+
+
+_caches: Dict[str, DocumentCache] = {}
+
+
+def get_cache() -> Optional[DocumentCache]:
+    """Return the cache configured via JINSI_CACHE_DIR, or None if caching is disabled."""
+    directory = os.environ.get(CACHE_DIR_VARIABLE)
+    if not directory:
+        return None
+    try:
+        return _caches[directory]
+    except KeyError:
+        cache = DocumentCache(directory)
+        _caches[directory] = cache
+        return cache
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .analysis import dependencies
+from .environment import Environment
+from .exceptions import NoCaseError, NoMatchError, NoSuchEnvironmentVariableError, NoSuchVariableError
+from .nodes import *
+from .util import empty, freeze, select
+
+Closure = Callable[[Environment], Value]
+
+_missing = object()
+
+
+def _raising(exc: Exception) -> Closure:
+    def closure(_env):
+        raise exc
+
+    return closure
+
+
+class ClosureCompiler:
+    """Compiles parsed templates into nested closures which evaluate like the nodes themselves.
+
+    Variables bound by `::let` are resolved once instead of on every evaluation and object keys without
+    placeholders are used as they are. The templates a `::let` binds are compiled when first used, so
+    templates which refer to themselves can be compiled. Results are memoized in the environment exactly
+    as `evaluate_memoized` does for the nodes, so both can share a memo."""
+
+    def __init__(self):
+        self.closures: Dict[Node, Closure] = {}
+
+    def compile(self, node: Node) -> Closure:
+        closure = self.closures.get(node)
+        if closure is None:
+            method = getattr(self, f"compile_{type(node).__name__.lower()}", None)
+            closure = node.evaluate if method is None else method(node)
+            self.closures[node] = closure
+        return closure
+
+    def compile_let_reference(self, node: Node, name: str) -> Closure:
+        """Evaluate the template bound to name as seen from node, memoized."""
+        try:
+            target = node.get_let(name)
+        except NoSuchVariableError as exc:
+            return _raising(exc)
+        return self.memoized(target)
+
+    def memoized(self, node: Node) -> Closure:
+        if isinstance(node, (Constant, GetDyn, GetEnvVar, LoopVariable)):
+            return self.compile(node)
+        compiled = None
+        deps = dependencies(node)
+        dyn = tuple(deps.dyn)
+        env_vars = tuple(deps.env)
+
+        def closure(env):
+            nonlocal compiled
+            if compiled is None:
+                compiled = self.compile(node)
+            try:
+                key = (
+                    node,
+                    tuple(freeze(env.lookup(name, _missing)) for name in dyn),
+                    tuple(env.get_var(name) for name in env_vars),
+                )
+            except TypeError:
+                return compiled(env)
+            result = env.memo.get(key, _missing)
+            if result is _missing:
+                result = compiled(env)
+                env.memo.put(key, result)
+            return result
+
+        return closure
+
+    def compile_empty(self, _node: Empty) -> Closure:
+        return lambda env: None
+
+    def compile_constant(self, node: Constant) -> Closure:
+        value = node.value
+        return lambda env: value
+
+    def compile_getlet(self, node: GetLet) -> Closure:
+        target = self.compile_let_reference(node, node.path[0])
+        path = node.path[1:]
+        if not path:
+            return target
+        return lambda env: select(target(env), *path)
+
+    def compile_getdyn(self, node: GetDyn) -> Closure:
+        name = node.path[0]
+        path = node.path[1:]
+        if not path:
+            return lambda env: env.get_dyn(name)
+        return lambda env: select(env.get_dyn(name), *path)
+
+    def compile_getenvvar(self, node: GetEnvVar) -> Closure:
+        name = node.name
+        return lambda env: env.get_var(name)
+
+    def compile_let(self, node: Let) -> Closure:
+        values = [(key, self.compile(value)) for key, value in node.env.items()]
+        body = self.compile(node.body)
+
+        def closure(env):
+            return body(env.with_env({key: value(env) for key, value in values}))
+
+        return closure
+
+    def compile_else(self, node: Else) -> Closure:
+        body = self.compile(node.body)
+        otherwise = self.compile(node.otherwise)
+
+        def closure(env):
+            # noinspection PyBroadException
+            try:
+                result = body(env)
+            except (NoSuchEnvironmentVariableError, ArithmeticError, ValueError, TypeError, LookupError):
+                result = None
+            except Exception as exc:
+                print(f"WARNING: Unexpected exception {exc}")
+                result = None
+            if empty(result):
+                result = otherwise(env)
+            return result
+
+        return closure
+
+    def compile_object(self, node: Object) -> Closure:
+        items: List[Tuple[Optional[Closure], Value, Closure]] = []
+        for key, child in node.children.items():
+            key_format = node.formats.get(key)
+            items.append((None if key_format is None else self.compile(key_format), key, self.compile(child)))
+        if all(format_key is None for format_key, _, _ in items):
+            children = [(key, child) for _, key, child in items]
+            return lambda env: {key: child(env) for key, child in children}
+
+        def closure(env):
+            result = {}
+            for format_key, key, child in items:
+                if format_key is not None:
+                    key = format_key(env)
+                result[key] = child(env)
+            return result
+
+        return closure
+
+    def compile_sequence(self, node: Sequence) -> Closure:
+        elements = [self.compile(element) for element in node.elements]
+        return lambda env: [element(env) for element in elements]
+
+    def compile_functionapplication(self, node: FunctionApplication) -> Closure:
+        function = node.function
+        args = [self.compile(arg) for arg in node.args]
+        return lambda env: function(*[arg(env) for arg in args])
+
+    def compile_application(self, node: Application) -> Closure:
+        kwargs = [(key, self.compile(value)) for key, value in node.kwargs.items()]
+        target = self.compile_let_reference(node, node.template)
+
+        def closure(env):
+            return target(env.with_env({key: value(env) for key, value in kwargs}))
+
+        return closure
+
+    def compile_loopvariable(self, node: LoopVariable) -> Closure:
+        each = node.parent
+
+        def closure(env):
+            result = env.lookup(each, _missing)
+            if result is _missing:
+                raise NoSuchVariableError(each.target)
+            return result
+
+        return closure
+
+    def compile_each(self, node: Each) -> Closure:
+        if node.source[:1] == "$":
+            name = node.source[1:]
+
+            def source(env):
+                return env.get_dyn(name)
+        else:
+            source = self.compile_let_reference(node.parent, node.source)
+        body = self.compile(node.body)
+        is_parallel = node.is_parallel
+        if node.target[:1] == "$":
+            target = node.target[1:]
+
+            def closure(env):
+                value = source(env)
+                if is_parallel(env, value):
+                    return node.evaluate_parallel(env, value)
+                with_env = env.with_env
+                return [body(with_env({target: entry})) for entry in value]
+        else:
+            def closure(env):
+                value = source(env)
+                if is_parallel(env, value):
+                    return node.evaluate_parallel(env, value)
+                with_env = env.with_env
+                return [body(with_env({"": entry, node: entry})) for entry in value]
+
+        return closure
+
+    def compile_when(self, node: When) -> Closure:
+        when = self.compile(node.when)
+        then = self.compile(node.then)
+        else_ = self.compile(node.else_)
+        return lambda env: then(env) if not empty(when(env)) else else_(env)
+
+    def compile_all(self, node: All) -> Closure:
+        nodes = [self.compile(child) for child in node.nodes]
+
+        def closure(env):
+            for child in nodes:
+                if empty(child(env)):
+                    return False
+            return True
+
+        return closure
+
+    def compile_any(self, node: Any) -> Closure:
+        nodes = [self.compile(child) for child in node.nodes]
+
+        def closure(env):
+            for child in nodes:
+                result = child(env)
+                if not empty(result):
+                    return result
+            return False
+
+        return closure
+
+    def compile_case(self, node: Case) -> Closure:
+        cases = [(self.compile(condition), self.compile(action)) for condition, action in node.cases]
+
+        def closure(env):
+            for condition, action in cases:
+                if condition(env):
+                    return action(env)
+            raise NoCaseError()
+
+        return closure
+
+    def compile_match(self, node: Match) -> Closure:
+        condition = self.compile(node.condition)
+        values = [(value, self.compile(action)) for value, action in node.values.items()]
+
+        def closure(env):
+            condition_value = condition(env)
+            for value, action in values:
+                if value == condition_value:
+                    return action(env)
+            raise NoMatchError()
+
+        return closure
+
+    def compile_format(self, node: Format) -> Closure:
+        parts = [part if isinstance(part, str) else self.compile(part) for part in node.parts]
+        if not parts:
+            return lambda env: ""
+        if len(parts) == 1 and isinstance(parts[0], str):
+            text = parts[0]
+            return lambda env: text
+
+        def closure(env):
+            return "".join([part if isinstance(part, str) else str(part(env)) for part in parts])
+
+        return closure
+
+
+def compile_closure(node: Node) -> Closure:
+    """Compile a parsed document into a closure which evaluates it in a given environment."""
+    return ClosureCompiler().compile(node)
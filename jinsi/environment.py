@@ -1,30 +1,71 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, Any as Value
+from concurrent.futures import Executor
+from typing import Dict, Hashable, Optional, Any as Value
 
 from .exceptions import NoSuchEnvironmentVariableError
+from .util import LRUCache
+
+_missing = object()
 
 
 class Environment:
+    """A chain of scopes binding dynamic variables.
+
+    Extending an environment links a new scope to its parent instead of copying the bindings.
+    Chains are flattened once they get deeper than `max_depth` to keep lookups cheap."""
+
+    memo_size: int = 4096
+    max_depth: int = 32
+
     def __init__(self, **env):
-        self.dyn: Dict[str, Value] = {}
-        for key, value in env.items():
-            self.dyn[key] = value
+        self.dyn: Dict[Hashable, Value] = env
+        self.parent: Optional[Environment] = None
+        self.depth: int = 0
+        self.memo = LRUCache(maxsize=self.memo_size)
+        self.executor: Optional[Executor] = None
+        self.numtype: type = float
 
     @staticmethod
     def get_var(key: str) -> Value:
         return os.getenv(key)
 
     def get_dyn(self, key: str) -> Value:
-        if key in self.dyn:
-            return self.dyn[key]
-        raise NoSuchEnvironmentVariableError(key)
-
-    def with_env(self, env: Dict[str, Value]) -> Environment:
-        new_env = Environment()
-        for key, value in self.dyn.items():
-            new_env.dyn[key] = value
-        for key, value in env.items():
-            new_env.dyn[key] = value
+        result = self.lookup(key, _missing)
+        if result is _missing:
+            raise NoSuchEnvironmentVariableError(key)
+        return result
+
+    def lookup(self, key: Hashable, default: Value = None) -> Value:
+        env = self
+        while env is not None:
+            try:
+                return env.dyn[key]
+            except KeyError:
+                env = env.parent
+        return default
+
+    def bindings(self) -> Dict[Hashable, Value]:
+        """Return all visible bindings as a single dict."""
+        result = {} if self.parent is None else self.parent.bindings()
+        result.update(self.dyn)
+        return result
+
+    def with_env(self, env: Dict[Hashable, Value]) -> Environment:
+        if not env:
+            return self
+        new_env = Environment.__new__(Environment)
+        new_env.memo = self.memo
+        new_env.executor = self.executor
+        new_env.numtype = self.numtype
+        if self.depth < self.max_depth:
+            new_env.dyn = env
+            new_env.parent = self
+            new_env.depth = self.depth + 1
+        else:
+            new_env.dyn = self.bindings()
+            new_env.dyn.update(env)
+            new_env.parent = None
+            new_env.depth = 0
         return new_env
@@ -38,6 +38,14 @@ class NoMergePossible(JinsiException):
     pass
 
 
+class IncludeCycleError(JinsiException):
+    def __init__(self, paths):
+        self.paths = tuple(paths)
+
+    def __str__(self):
+        return " -> ".join(self.paths)
+
+
 class NoCaseError(JinsiException):
     pass
 
@@ -429,14 +429,12 @@ class Functions:
     @staticmethod
     def deepmerge(*items):
         def _merge(a, b):
+            result = dict(a)
             for key in b:
-                if key in a:
-                    if isinstance(a[key], dict) and isinstance(b[key], dict):
-                        _merge(a[key], b[key])
-                    else:
-                        a[key] = b[key]
+                if key in result and isinstance(result[key], dict) and isinstance(b[key], dict):
+                    result[key] = _merge(result[key], b[key])
                 else:
-                    a[key] = b[key]
-            return a
+                    result[key] = b[key]
+            return result
 
         return reduce(_merge, items)
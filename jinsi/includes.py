@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import copy
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .cache import get_cache
+from .exceptions import IncludeCycleError, NoParseError
+from .util import Stamp, file_stamp, merge
+from .value import Value
+from .yamlutil import loadyaml_list
+
+
+class _Entry(NamedTuple):
+    docs: List[Value]
+    files: Tuple[Tuple[str, Stamp], ...]
+
+
+class IncludeResolver:
+    """Finds and loads the files named by `::include`.
+
+    Relative names are looked up next to the including file, then in each directory of the search path
+    and finally in the current working directory. Included files are loaded at most once for as long as
+    they are not modified, `::include`s within them are expanded when they are loaded."""
+
+    def __init__(self, search_path: Iterable[str] = ()):
+        self.search_path = list(search_path)
+        self._entries: Dict[str, _Entry] = {}
+
+    def resolve(self, name: str, *, base: Optional[str] = None) -> str:
+        """The absolute path of the file included as `name` from the file `base`."""
+        if os.path.isabs(name):
+            return os.path.normpath(name)
+        directories = [os.path.dirname(base)] if base else []
+        directories.extend(self.search_path)
+        directories.append(os.getcwd())
+        for directory in directories:
+            path = os.path.abspath(os.path.join(directory, name))
+            if os.path.isfile(path):
+                return path
+        return os.path.abspath(os.path.join(directories[0], name))
+
+    def load(
+            self, name: str, *,
+            base: Optional[str] = None,
+            stack: Tuple[str, ...] = (),
+    ) -> Tuple[List[Value], List[str]]:
+        """The documents of an included file, with the paths of all files they were loaded from.
+
+        The documents are copies which may be modified freely. `stack` are the paths of the files which
+        are currently being included, including one of them again raises an `IncludeCycleError`."""
+        path = self.resolve(name, base=base)
+        entry = self._load(path, stack)
+        return copy.deepcopy(entry.docs), [file for file, _ in entry.files]
+
+    def _load(self, path: str, stack: Tuple[str, ...]) -> _Entry:
+        if path in stack:
+            raise IncludeCycleError(stack + (path,))
+        entry = self._entries.get(path)
+        if entry is not None and all(file_stamp(file) == stamp for file, stamp in entry.files):
+            for file, _ in entry.files:
+                if file in stack:
+                    raise IncludeCycleError(stack + (path, file))
+            return entry
+        stamp = file_stamp(path)
+        cache = get_cache()
+        with open(path) as f:
+            if cache is None:
+                docs = loadyaml_list(f.read())
+            else:
+                docs = cache.load(f.read(), loadyaml_list)
+        files = {path: stamp}
+        docs = [self._expand(doc, path, stack + (path,), files) for doc in docs]
+        entry = _Entry(docs, tuple(files.items()))
+        self._entries[path] = entry
+        return entry
+
+    def _expand(self, obj: Value, path: str, stack: Tuple[str, ...], files: Dict[str, Stamp]) -> Value:
+        if isinstance(obj, list):
+            return [self._expand(item, path, stack, files) for item in obj]
+        if not isinstance(obj, dict):
+            return obj
+        obj = {key: self._expand(value, path, stack, files) for key, value in obj.items()}
+        if '::include' not in obj:
+            return obj
+        names = obj.pop('::include')
+        if isinstance(names, str):
+            names = [names]
+        if not isinstance(names, list):
+            raise NoParseError()
+        docs = [obj]
+        for name in names:
+            entry = self._load(self.resolve(name, base=path), stack)
+            files.update(entry.files)
+            docs.extend(copy.deepcopy(entry.docs))
+        return merge(*docs)
+
+    def clear(self):
+        """Forget all loaded files."""
+        self._entries.clear()
+
+
+_resolver = IncludeResolver()
+
+
+def get_resolver() -> IncludeResolver:
+    """The resolver shared by all parsing in this process."""
+    return _resolver
@@ -2,11 +2,112 @@ import dataclasses
 import datetime
 import json
 from decimal import Decimal
-from typing import Iterator, Any, Union
+from typing import Iterator, Any, TextIO, Union
+
+try:
+    from json.encoder import c_make_encoder, c_encode_basestring, c_encode_basestring_ascii
+except ImportError:
+    # json builds without its C speedups may not provide them at all
+    c_make_encoder = c_encode_basestring = c_encode_basestring_ascii = None
 
 INFINITY = float('inf')
 
 
+class _Unsupported(Exception):
+    pass
+
+
+class _Inexact(_Unsupported):
+    pass
+
+
+class _RawNumber(str):
+    """The text of a number which the C encoder writes as it is instead of as a string."""
+    __slots__ = ()
+
+
+def _prepare_number(o: Decimal) -> Union[int, float]:
+    text = str(o)
+    candidate = int(o) if o == o.to_integral_value() else float(o)
+    if repr(candidate) != text:
+        raise _Inexact
+    return candidate
+
+
+def _prepare_raw_number(o: Decimal) -> Union[int, float, _RawNumber]:
+    try:
+        return _prepare_number(o)
+    except _Inexact:
+        return _RawNumber(o)
+
+
+def _encode_raw_numbers(encode_str):
+    """Wrap the string encoder of the C encoder such that it writes `_RawNumber`s unquoted."""
+
+    # noinspection PyShadowingBuiltins
+    def encode(s, type=type, raw=_RawNumber):
+        if type(s) is raw:
+            return s
+        return encode_str(s)
+
+    return encode
+
+
+# noinspection PyShadowingBuiltins
+def _prepare(
+        o: Any,
+        # HACK: hand-optimized bytecode; turn globals into locals
+        type=type,
+        str=str,
+        dict=dict,
+        list=list,
+        dec=Decimal,
+        date=datetime.date,
+        datetime=datetime.datetime,
+        basic=frozenset((str, int, float, bool, type(None))),
+        number=_prepare_number,
+) -> Any:
+    """Convert o into an equivalent value the C encoder renders exactly like `_make_iterencode` does.
+
+    Raises `_Unsupported` for anything the C encoder would render differently, e.g. non-string keys.
+    Decimals which no int or float renders exactly raise `_Inexact`, unless `number` turns them into
+    `_RawNumber`s instead."""
+    t = type(o)
+    if t in basic:
+        return o
+    if t is dict:
+        result = o
+        for key, value in o.items():
+            if type(key) is not str:
+                raise _Unsupported
+            if type(value) in basic:
+                continue
+            prepared = _prepare(value, number=number)
+            if prepared is not value:
+                if result is o:
+                    result = dict(o)
+                result[key] = prepared
+        return result
+    if t is list:
+        result = o
+        for ix, value in enumerate(o):
+            if type(value) in basic:
+                continue
+            prepared = _prepare(value, number=number)
+            if prepared is not value:
+                if result is o:
+                    result = list(o)
+                result[ix] = prepared
+        return result
+    if t is dec:
+        if not o.is_finite():
+            raise _Unsupported
+        return number(o)
+    if t is date or t is datetime:
+        return str(o)
+    raise _Unsupported
+
+
 class Decoder(json.JSONDecoder):
     def __init__(self):
         super().__init__(parse_int=Decimal, parse_float=Decimal)
@@ -23,10 +124,33 @@ class Encoder(json.JSONEncoder):
         return None
 
     def encode(self, o: Any) -> str:
-        pieces = self.iterencode(o)
+        pieces = self.iterencode(o, _one_shot=True)
         return "".join(list(pieces))
 
-    def iterencode(self, obj: Any, **kwargs) -> Iterator[str]:
+    def iterencode(self, obj: Any, _one_shot: bool = False) -> Iterator[str]:
+        encode_str = c_encode_basestring_ascii if self.ensure_ascii else c_encode_basestring
+        if _one_shot and c_make_encoder is not None and encode_str is not None:
+            try:
+                try:
+                    prepared = _prepare(obj)
+                except _Inexact:
+                    # keep using the C encoder, only the strings go through Python to find the numbers
+                    prepared = _prepare(obj, number=_prepare_raw_number)
+                    encode_str = _encode_raw_numbers(encode_str)
+            except (_Unsupported, RecursionError):
+                pass
+            else:
+                return iter(c_make_encoder(
+                    None,
+                    self.default,
+                    encode_str,
+                    None,
+                    ':',
+                    ',',
+                    False,
+                    False,
+                    self.allow_nan,
+                )(prepared, 0))
 
         def floatstr(
                 o,
@@ -156,6 +280,20 @@ def dumpjson(obj, **kwargs) -> str:
     return json.dumps(obj, cls=Encoder, **kwargs)
 
 
+def dumpjson_into(obj, stream: TextIO, *, buffer_size: int = 1 << 16, **kwargs):
+    """Write obj as JSON to a stream without building the whole string first."""
+    buffer = []
+    size = 0
+    for chunk in Encoder(**kwargs).iterencode(obj):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            stream.write("".join(buffer))
+            buffer.clear()
+            size = 0
+    stream.write("".join(buffer))
+
+
 def loadjson(s):
     return json.loads(s)
 
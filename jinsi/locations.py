@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Dict, NamedTuple, Optional
+
+from .nodes import *
+from .parser import Parser
+from .yamlutil import Marks
+
+
+class Location(NamedTuple):
+    file: Optional[str]
+    line: int
+    column: int
+
+    def __str__(self) -> str:
+        return f"{self.file or '<string>'}:{self.line}:{self.column}"
+
+
+class LocatingParser(Parser):
+    """A parser which records the location each node was parsed from, as found in the given marks.
+
+    Mappings and sequences as well as the entries of objects, sequences and `::let` get exact locations.
+    Other nodes can be located through their parents, see `locate`. Locations are recorded by the hooks
+    `derived` and `parsed` only, so parsing recurses exactly as deep as it does without locations."""
+
+    def __init__(self, marks: Dict[int, Marks], *, file: Optional[str] = None):
+        super().__init__(source=file)
+        self.marks = marks
+        self.file = file
+        self.locations: Dict[Node, Location] = {}
+        # marks of the mappings the parser builds from the entries of marked ones
+        self._derived: Dict[int, Marks] = {}
+
+    def _marks(self, obj: Value) -> Optional[Marks]:
+        marks = self.marks.get(id(obj)) or self._derived.get(id(obj))
+        if marks is None or marks.obj is not obj:
+            return None
+        return marks
+
+    def _record(self, node: Node, position):
+        self.locations.setdefault(node, Location(self.file, *position))
+
+    def _record_children(self, children, marks: Marks):
+        positions = marks.children
+        for key, child in children:
+            position = positions.get(key)
+            if position is not None:
+                self._record(child, position)
+
+    def derived(self, obj: Dict, derived: Dict) -> Dict:
+        marks = self._marks(obj)
+        if marks is not None:
+            self._derived[id(derived)] = Marks(derived, marks.start, marks.children)
+        return derived
+
+    def parsed(self, obj: Value, node: Node) -> Node:
+        if isinstance(node, Let):
+            let_marks = self._marks(obj['::let'])
+            if let_marks is not None:
+                self._record_children(((f"${key}", child) for key, child in node.env.items()), let_marks)
+                self._record_children(node.let.items(), let_marks)
+        marks = self._marks(obj)
+        if marks is None:
+            return node
+        self._record(node, marks.start)
+        if isinstance(node, Object):
+            self._record_children(node.children.items(), marks)
+        elif isinstance(node, Sequence):
+            self._record_children(enumerate(node.elements), marks)
+        return node
+
+
+def locate(locations: Dict[Node, Location], node: Node) -> Optional[Location]:
+    """The location of a node, or of its closest ancestor if it has none itself."""
+    while not isinstance(node, Empty):
+        location = locations.get(node)
+        if location is not None:
+            return location
+        node = node.parent
+    return None
@@ -2,8 +2,11 @@ import os
 import re
 import sys
 import textwrap
+import time
 
 from jinsi import *
+from jinsi.profiler import Profiler
+from jinsi.watch import Watcher
 
 import jinsi
 
@@ -14,7 +17,7 @@ def print_version(*, _print=print):
 
 def print_help(*, _print=print):
     _print(textwrap.dedent(f"""
-        {sys.argv[0]} [-j] [args...]
+        {sys.argv[0]} [-j] [-P N] [-o FILE] [-w] [--profile] [--profile-output FILE] [args...]
     
         ...where each argument may be:
         
@@ -24,25 +27,162 @@ def print_help(*, _print=print):
     
         The following options are recognized:
         
-          -j  --json      Format output as JSON lines
+          -j  --json          Format output as JSON lines
+          -P  --parallel N    Render files and documents in N processes
+          -o  --output FILE   Write output directly into FILE instead of standard output
+          -w  --watch         Keep running and render again whenever a file or a file it includes changes
+              --profile       Print the time spent in each node to standard error
+              --profile-output FILE
+                              Write the time spent in each node as folded stacks into FILE
+                              (for flamegraph.pl or speedscope)
+
+        Profiling always renders in a single process. Watching can not be combined with
+        rendering in parallel or profiling.
         
         Standalone options:
     
-          -v  --version   Print version information
-          -h  --help      Print this help screen
+          -v  --version       Print version information
+          -h  --help          Print this help screen
         
     """))
 
 
-def main(*argv, _print=print, _open=open, _stdin=sys.stdin):
+def _compile_sequentially(args, *, locations=False, _open, _stdin):
+    for arg in args:
+        if arg == '-':
+            yield compile_string(_stdin.read(), locations=locations)
+        else:
+            yield compile_file(arg, locations=locations, _open=_open)
+
+
+def _compile_profiled(args, *, profiler, _open, _stdin):
+    for template in _compile_sequentially(args, locations=profiler is not None, _open=_open, _stdin=_stdin):
+        if profiler is not None:
+            profiler.add(template.documents, source=template.source, locations=template.locations)
+        yield template
+
+
+def _render_sequentially(args, *, env, fmt_json, profiler, _open, _stdin):
+    for template in _compile_profiled(args, profiler=profiler, _open=_open, _stdin=_stdin):
+        yield from template.render(args=env, as_json=fmt_json, profiler=profiler)
+
+
+def _write_output(path, args, *, env, fmt_json, workers, profiler, _open, _stdin):
+    with open(path, 'w') as stream:
+        writer = DocumentWriter(stream, as_json=fmt_json)
+        if workers:
+            sources = [compile_string(_stdin.read()) if arg == '-' else arg for arg in args]
+            for doc in render_many(sources, args=env, as_json=fmt_json, workers=workers):
+                writer.write_rendered(doc)
+        else:
+            for template in _compile_profiled(args, profiler=profiler, _open=_open, _stdin=_stdin):
+                template.write(writer, args=env, profiler=profiler)
+
+
+def _render(args, *, env, fmt_json, workers, output, profiler, _print, _open, _stdin):
+    if output:
+        _write_output(output, args, env=env, fmt_json=fmt_json, workers=workers, profiler=profiler,
+                      _open=_open, _stdin=_stdin)
+        return
+    if workers:
+        sources = [compile_string(_stdin.read()) if arg == '-' else arg for arg in args]
+        docs = render_many(sources, args=env, as_json=fmt_json, workers=workers)
+    else:
+        docs = _render_sequentially(args, env=env, fmt_json=fmt_json, profiler=profiler, _open=_open, _stdin=_stdin)
+    _print_docs(docs, fmt_json=fmt_json, _print=_print)
+
+
+def _print_docs(docs, *, fmt_json, _print):
+    count = 0
+    for doc in docs:
+        count += 1
+        if fmt_json:
+            _print(doc)
+        else:
+            if count > 1:
+                _print("---")
+            if doc[-1] == '\n':
+                _print(doc, end='')
+            else:
+                _print(doc)
+
+
+def _watch(args, *, env, fmt_json, output, interval=0.5, _print, _open, _stdin, _stderr):
+    stdin = compile_string(_stdin.read()) if '-' in args else None
+    watcher = Watcher([arg for arg in args if arg != '-'], _open=_open)
+    rendered = {}
+
+    def report_errors(paths):
+        for path in paths:
+            if path in watcher.errors:
+                print(f"error: {path}: {watcher.errors[path]}", file=_stderr)
+
+    def render(arg):
+        template = stdin if arg == '-' else watcher.templates.get(arg)
+        if template is None:
+            rendered[arg] = []
+            return
+        try:
+            rendered[arg] = list(template.render(args=env, as_json=fmt_json))
+        except Exception as exc:
+            print(f"error: {arg}: {exc}", file=_stderr)
+
+    def emit(affected):
+        if output:
+            with open(output, 'w') as stream:
+                writer = DocumentWriter(stream, as_json=fmt_json)
+                for arg in args:
+                    for doc in rendered.get(arg, ()):
+                        writer.write_rendered(doc)
+        else:
+            _print_docs((doc for arg in args if arg in affected for doc in rendered.get(arg, ())),
+                        fmt_json=fmt_json, _print=_print)
+
+    report_errors(watcher.paths)
+    for arg in args:
+        render(arg)
+    emit(args)
+    try:
+        while True:
+            time.sleep(interval)
+            start = time.perf_counter()
+            affected = watcher.poll()
+            report_errors(affected)
+            # a file which failed to compile keeps its previous output
+            rebuilt = [path for path in affected if path not in watcher.errors]
+            if not rebuilt:
+                continue
+            for path in rebuilt:
+                render(path)
+            emit(rebuilt)
+            elapsed = time.perf_counter() - start
+            print(f"rebuilt {', '.join(rebuilt)} in {elapsed * 1000:.1f} ms", file=_stderr)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(*argv, _print=print, _open=open, _stdin=sys.stdin, _stderr=sys.stderr):
     args = []
     env = {}
     fmt_json = False
+    workers = 0
+    output = None
+    watch = False
+    profile = False
+    profile_output = None
     if argv:
         args_it = iter(argv)
     else:
         args_it = iter(sys.argv)
         next(args_it)
+
+    def option_value(option, expected, convert=str):
+        try:
+            return convert(next(args_it))
+        except (StopIteration, ValueError):
+            print(f"{option} expects {expected}", file=_stderr)
+            raise SystemExit(2) from None
+
     opt_parsing = True
     for arg in args_it:
         if arg == "--":
@@ -60,6 +200,21 @@ def main(*argv, _print=print, _open=open, _stdin=sys.stdin):
             if arg in ("-j", "-json", "--json"):
                 fmt_json = True
                 continue
+            if arg in ("-P", "-parallel", "--parallel"):
+                workers = option_value(arg, "a number of processes", int)
+                continue
+            if arg in ("-o", "-output", "--output"):
+                output = option_value(arg, "a file name")
+                continue
+            if arg in ("-w", "-watch", "--watch"):
+                watch = True
+                continue
+            if arg in ("-profile", "--profile"):
+                profile = True
+                continue
+            if arg in ("-profile-output", "--profile-output"):
+                profile_output = option_value(arg, "a file name")
+                continue
             m = re.match(r"([^=]+)=(.*)", arg)
             if m:
                 key = m.group(1)
@@ -69,20 +224,21 @@ def main(*argv, _print=print, _open=open, _stdin=sys.stdin):
         args.append(arg)
     if not args:
         args = ["-"]
-    count = 0
-    for arg in args:
-        if arg == '-':
-            docs = render_string(_stdin.read(), args=env, as_json=fmt_json)
-        else:
-            docs = render_file(arg, args=env, as_json=fmt_json, _open=_open)
-        for doc in docs:
-            count += 1
-            if fmt_json:
-                _print(doc)
-            else:
-                if count > 1:
-                    _print("---")
-                if doc[-1] == '\n':
-                    _print(doc, end='')
-                else:
-                    _print(doc)
+    if watch:
+        if workers or profile or profile_output:
+            print("--watch can not be combined with --parallel, --profile or --profile-output", file=_stderr)
+            raise SystemExit(2)
+        _watch(args, env=env, fmt_json=fmt_json, output=output, _print=_print, _open=_open, _stdin=_stdin,
+               _stderr=_stderr)
+        return
+    profiler = None
+    if profile or profile_output:
+        profiler = Profiler()
+        workers = 0
+    _render(args, env=env, fmt_json=fmt_json, workers=workers, output=output, profiler=profiler,
+            _print=_print, _open=_open, _stdin=_stdin)
+    if profile:
+        profiler.report(_stderr)
+    if profile_output:
+        with open(profile_output, 'w') as stream:
+            profiler.write_stacks(stream)
@@ -1,28 +1,76 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import os
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 
 from .environment import Environment
 from .exceptions import NoSuchVariableError, NoSuchEnvironmentVariableError, NoCaseError, NoMatchError
-from .util import Singleton, select, substitute, empty, cached_method
+from .util import Singleton, select, split_format, empty, freeze, treat
 from .value import Value
 
+_missing = object()
+
+
+def evaluate_memoized(node: Node, env: Environment) -> Value:
+    """Evaluate a node, reusing an earlier result if the variables it reads have the same values.
+
+    Results are kept in the memo of the environment, which is shared by a whole evaluation."""
+    if isinstance(node, (Constant, GetDyn, GetEnvVar, LoopVariable)):
+        # cheaper to evaluate than to look up
+        return node.evaluate(env)
+    deps = analysis.dependencies(node)
+    try:
+        key = (
+            node,
+            tuple(freeze(env.lookup(name, _missing)) for name in deps.dyn),
+            tuple(env.get_var(name) for name in deps.env),
+        )
+    except TypeError:
+        return node.evaluate(env)
+    result = env.memo.get(key, _missing)
+    if result is _missing:
+        result = node.evaluate(env)
+        env.memo.put(key, result)
+    return result
+
 
 class Node:
+    __slots__ = ('parent', '__weakref__')
+
     is_empty = False
 
     def __init__(self, parent: Node):
         self.parent: Node = parent
-        self.is_empty = False
 
     def get_let(self, name: str) -> Node:
         return self.parent.get_let(name)
 
     def evaluate(self, env: Environment) -> Value:
-        return None
+        raise NotImplementedError
+
+    def load(self, env: Environment) -> Value:
+        """Evaluate into an independent value with numbers converted to the numtype of the environment.
+
+        Nodes which build their result themselves convert while building it instead of copying it afterwards."""
+        result = self.evaluate(env)
+        if isinstance(result, str):
+            return result
+        return treat(result, numtype=env.numtype)
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        """Load the items of a mapping as key-value pairs or the elements of a sequence one by one."""
+        value = self.load(env)
+        if isinstance(value, dict):
+            yield from value.items()
+        elif isinstance(value, list):
+            yield from value
+        else:
+            raise TypeError(f"Can not iterate {value} of type {type(value)}")
 
 
 class Empty(Node, metaclass=Singleton):
+    __slots__ = ()
+
     is_empty = True
 
     def __init__(self):
@@ -31,8 +79,16 @@ class Empty(Node, metaclass=Singleton):
     def get_let(self, name: str) -> Node:
         raise NoSuchVariableError(name)
 
+    def evaluate(self, env: Environment) -> Value:
+        return None
+
+    def __reduce__(self):
+        return Empty, ()
+
 
 class Constant(Node):
+    __slots__ = ('value',)
+
     def __init__(self, parent: Node, value: Value):
         super().__init__(parent)
         self.value = value
@@ -42,18 +98,22 @@ class Constant(Node):
 
 
 class GetLet(Node):
+    __slots__ = ('path',)
+
     def __init__(self, parent: Node, path: List[str]):
         super().__init__(parent)
         self.path: List[str] = path
 
     def evaluate(self, env: Environment) -> Value:
-        result = self.get_let(self.path[0]).evaluate(env)
+        result = evaluate_memoized(self.get_let(self.path[0]), env)
         if len(self.path) > 1:
             result = select(result, *self.path[1:])
         return result
 
 
 class GetDyn(Node):
+    __slots__ = ('path',)
+
     def __init__(self, parent: Node, path: List[str]):
         super().__init__(parent)
         self.path: List[str] = path
@@ -66,6 +126,8 @@ class GetDyn(Node):
 
 
 class GetEnvVar(Node):
+    __slots__ = ('name',)
+
     def __init__(self, parent: Node, name: str):
         super().__init__(parent)
         self.name: str = name
@@ -75,6 +137,8 @@ class GetEnvVar(Node):
 
 
 class Let(Node):
+    __slots__ = ('let', 'env', 'body')
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.let: Dict[str, Node] = {}
@@ -82,12 +146,19 @@ class Let(Node):
         self.body: Node = Empty()
 
     def evaluate(self, env: Environment) -> Value:
-        if not self.env:
-            return self.body.evaluate(env)
+        return self.body.evaluate(self.body_env(env))
+
+    def load(self, env: Environment) -> Value:
+        return self.body.load(self.body_env(env))
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        return self.body.load_items(self.body_env(env))
+
+    def body_env(self, env: Environment) -> Environment:
         my_env: Dict[str, Value] = {}
         for key, node in self.env.items():
             my_env[key] = node.evaluate(env)
-        return self.body.evaluate(env.with_env(my_env))
+        return env.with_env(my_env)
 
     def get_let(self, name: str) -> Node:
         if name not in self.let:
@@ -96,6 +167,8 @@ class Let(Node):
 
 
 class Else(Node):
+    __slots__ = ('body', 'otherwise')
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.body: Node = Empty()
@@ -119,19 +192,52 @@ class Else(Node):
 
 
 class Object(Node):
+    """A mapping. Keys are used as they are, unless they contain placeholders and have a node in `formats`."""
+    __slots__ = ('children', 'formats')
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.children: Dict[str, Node] = {}
+        self.formats: Dict[str, Node] = {}
+
+    def add_child(self, key: Value, node: Node):
+        if isinstance(key, str) and len(split_format(key)) > 1:
+            self.formats[key] = Format(self, key)
+        self.children[key] = node
 
     def evaluate(self, env: Environment) -> Value:
+        formats = self.formats
+        if not formats:
+            return {key: node.evaluate(env) for key, node in self.children.items()}
+        result = {}
+        for key, node in self.children.items():
+            if key in formats:
+                key = formats[key].evaluate(env)
+            result[key] = node.evaluate(env)
+        return result
+
+    def load(self, env: Environment) -> Value:
+        formats = self.formats
+        if not formats:
+            return {key: node.load(env) for key, node in self.children.items()}
         result = {}
         for key, node in self.children.items():
-            key_f = Format(self, key).evaluate(env)
-            result[key_f] = node.evaluate(env)
+            if key in formats:
+                key = formats[key].evaluate(env)
+            result[key] = node.load(env)
         return result
 
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        formats = self.formats
+        for key, node in self.children.items():
+            if key in formats:
+                key = formats[key].evaluate(env)
+            yield key, node.load(env)
+
 
 class Sequence(Node):
+    __slots__ = ('elements',)
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.elements: List[Node] = []
@@ -142,8 +248,20 @@ class Sequence(Node):
             result.append(element.evaluate(env))
         return result
 
+    def load(self, env: Environment) -> Value:
+        result = []
+        for element in self.elements:
+            result.append(element.load(env))
+        return result
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        for element in self.elements:
+            yield element.load(env)
+
 
 class FunctionApplication(Node):
+    __slots__ = ('function', 'args')
+
     def __init__(self, parent: Node, function):
         super().__init__(parent)
         self.function = function
@@ -158,56 +276,105 @@ class FunctionApplication(Node):
 
 
 class Application(Node):
+    __slots__ = ('template', 'kwargs')
+
     def __init__(self, parent: Node, template: str):
         super().__init__(parent)
         self.template = template
         self.kwargs: Dict[str, Node] = {}
 
-    @cached_method
     def evaluate(self, env: Environment) -> Value:
         my_env: Dict[str, Value] = {}
         for key, node in self.kwargs.items():
             my_env[key] = node.evaluate(env)
-        return self.get_let(self.template).evaluate(env.with_env(my_env))
+        return evaluate_memoized(self.get_let(self.template), env.with_env(my_env))
+
+
+class LoopVariable(Node):
+    """The value an `::each` without `$` binds, which it keeps in the environment under its own node."""
+    __slots__ = ()
+
+    def evaluate(self, env: Environment) -> Value:
+        result = env.lookup(self.parent, _missing)
+        if result is _missing:
+            raise NoSuchVariableError(self.parent.target)
+        return result
 
 
 class Each(Node):
+    __slots__ = ('source', 'target', 'body', 'variable')
+
+    parallel_threshold: int = 64
+    parallel_chunks: int = 4 * (os.cpu_count() or 1)
+
     def __init__(self, parent: Node, source: str, target: str):
         super().__init__(parent)
         self.source: str = source
         self.target: str = target
         self.body: Node = Empty()
-        self._value: Node = Empty()
+        self.variable: Node = LoopVariable(self)
 
     def get_let(self, name: str) -> Node:
         if name == self.target:
-            return self._value
+            return self.variable
         else:
             return super().get_let(name)
 
-    def evaluate(self, env: Environment) -> Value:
+    def evaluate_source(self, env: Environment) -> Value:
         if self.source[:1] == "$":
-            value = env.get_dyn(self.source[1:])
-        else:
-            value = self.parent.get_let(self.source).evaluate(env)
+            return env.get_dyn(self.source[1:])
+        return evaluate_memoized(self.parent.get_let(self.source), env)
+
+    def is_parallel(self, env: Environment, value: Value) -> bool:
+        return env.executor is not None and isinstance(value, list) and len(value) >= self.parallel_threshold
+
+    def evaluate(self, env: Environment) -> Value:
+        value = self.evaluate_source(env)
+        if self.is_parallel(env, value):
+            return self.evaluate_parallel(env, value)
+        return self.evaluate_entries(env, value)
+
+    def load(self, env: Environment) -> Value:
+        value = self.evaluate_source(env)
+        if self.is_parallel(env, value):
+            return treat(self.evaluate_parallel(env, value), numtype=env.numtype)
+        results = []
+        for entry in value:
+            results.append(self.body.load(self.entry_env(env, entry)))
+        return results
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        return self.load_entries(env, self.evaluate_source(env))
+
+    def entry_env(self, env: Environment, entry: Value) -> Environment:
+        if self.target[:1] == "$":
+            return env.with_env({self.target[1:]: entry})
+        return env.with_env({"": entry, self: entry})
+
+    def load_entries(self, env: Environment, entries: Iterable[Value]) -> Iterator[Value]:
+        for entry in entries:
+            yield self.body.load(self.entry_env(env, entry))
+
+    def evaluate_parallel(self, env: Environment, entries: List[Value]) -> Value:
+        """Evaluate the body for chunks of entries in the executor of the environment, keeping their order."""
+        chunk_size = max(self.parallel_threshold, -(-len(entries) // self.parallel_chunks))
+        return parallel.evaluate_chunks(self, env, entries, chunk_size)
+
+    def evaluate_entries(self, env: Environment, entries: Iterable[Value]) -> Value:
         results = []
-        i = 0
         if self.target[:1] == "$":
             target = self.target[1:]
-            for entry in value:
-                result = self.body.evaluate(env.with_env({target: entry}))
-                results.append(result)
-                i += 1
+            for entry in entries:
+                results.append(self.body.evaluate(env.with_env({target: entry})))
         else:
-            for entry in value:
-                self._value: Node = Constant(self, entry)
-                result = self.body.evaluate(env.with_env({"": entry}))
-                results.append(result)
-                i += 1
+            for entry in entries:
+                results.append(self.body.evaluate(env.with_env({"": entry, self: entry})))
         return results
 
 
 class When(Node):
+    __slots__ = ('when', 'then', 'else_')
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.when: Node = Empty()
@@ -215,13 +382,24 @@ class When(Node):
         self.else_: Node = Empty()
 
     def evaluate(self, env: Environment) -> Value:
+        return self.branch(env).evaluate(env)
+
+    def load(self, env: Environment) -> Value:
+        return self.branch(env).load(env)
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        return self.branch(env).load_items(env)
+
+    def branch(self, env: Environment) -> Node:
         if not empty(self.when.evaluate(env)):
-            return self.then.evaluate(env)
+            return self.then
         else:
-            return self.else_.evaluate(env)
+            return self.else_
 
 
 class All(Node):
+    __slots__ = ('nodes',)
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.nodes: List[Node] = []
@@ -234,6 +412,8 @@ class All(Node):
 
 
 class Any(Node):
+    __slots__ = ('nodes',)
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.nodes: List[Node] = []
@@ -247,43 +427,78 @@ class Any(Node):
 
 
 class Case(Node):
+    __slots__ = ('cases',)
+
     def __init__(self, parent: Node):
         super().__init__(parent)
         self.cases: List[Tuple[Node, Node]] = []
 
     def evaluate(self, env: Environment) -> Value:
+        return self.branch(env).evaluate(env)
+
+    def load(self, env: Environment) -> Value:
+        return self.branch(env).load(env)
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        return self.branch(env).load_items(env)
+
+    def branch(self, env: Environment) -> Node:
         for condition, action in self.cases:
             if condition.evaluate(env):
-                return action.evaluate(env)
+                return action
         raise NoCaseError()
 
 
 class Match(Node):
+    __slots__ = ('condition', 'values')
+
     def __init__(self, condition: Node, parent: Node):
         super().__init__(parent)
         self.condition: Node = condition
         self.values: Dict[str, Node] = {}
 
     def evaluate(self, env: Environment) -> Value:
+        return self.branch(env).evaluate(env)
+
+    def load(self, env: Environment) -> Value:
+        return self.branch(env).load(env)
+
+    def load_items(self, env: Environment) -> Iterator[Value]:
+        return self.branch(env).load_items(env)
+
+    def branch(self, env: Environment) -> Node:
         condition_value = self.condition.evaluate(env)
         for value, action in self.values.items():
             if value == condition_value:
-                return action.evaluate(env)
+                return action
         raise NoMatchError()
 
 
 class Format(Node):
-    def __init__(self, parent: Node, value: Value):
+    __slots__ = ('value', 'parts')
+
+    def __init__(self, parent: Node, value: str):
         super().__init__(parent)
-        self.value: Value = value
+        self.value: str = value
+        self.parts: List[Union[str, Node]] = []
+        for ix, part in enumerate(split_format(value)):
+            if ix % 2 == 0:
+                if part:
+                    self.parts.append(part)
+            elif part[:1] == "$":
+                self.parts.append(GetDyn(parent=self, path=part[1:].split(".")))
+            else:
+                self.parts.append(GetLet(parent=self, path=part.split(".")))
 
     def evaluate(self, env: Environment) -> Value:
-        def subst(key: str) -> str:
-            if key[:1] == "$":
-                getter = GetDyn(parent=self, path=key[1:].split("."))
+        result = []
+        for part in self.parts:
+            if isinstance(part, str):
+                result.append(part)
             else:
-                getter = GetLet(parent=self, path=key.split("."))
-            result = getter.evaluate(env)
-            return str(result)
+                result.append(str(part.evaluate(env)))
+        return "".join(result)
+
 
-        return substitute(self.value, subst)
+# analysis inspects the node classes defined above, parallel evaluates them
+from . import analysis, parallel  # noqa: E402
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from .nodes import Empty, Node
+
+Entries = List[Tuple[type, Dict]]
+
+
+class NodeRef(int):
+    """Stands for the node at this index in a flattened node table."""
+
+
+def slot_names(cls: type) -> Tuple[str, ...]:
+    return tuple(
+        name for klass in cls.__mro__ for name in klass.__dict__.get('__slots__', ())
+        if name != '__weakref__'
+    )
+
+
+class NodeTable:
+    """Flattens the node trees referenced by a value into a list, so pickling does not recurse along them.
+
+    Nodes link to their parents and children, which pickle would follow recursively, one tree level after
+    the other, until it hits the recursion limit for deeply nested templates."""
+
+    def __init__(self):
+        self.nodes: List[Node] = []
+        self.index: Dict[int, int] = {}
+
+    def ref(self, value):
+        if isinstance(value, Node) and not isinstance(value, Empty):
+            ix = self.index.get(id(value))
+            if ix is None:
+                ix = self.index[id(value)] = len(self.nodes)
+                self.nodes.append(value)
+            return NodeRef(ix)
+        if type(value) is list:
+            return [self.ref(item) for item in value]
+        if type(value) is tuple:
+            return tuple(self.ref(item) for item in value)
+        if type(value) is dict:
+            return {self.ref(key): self.ref(item) for key, item in value.items()}
+        return value
+
+    def dump(self, value) -> Tuple[Entries, object]:
+        value = self.ref(value)
+        entries = []
+        ix = 0
+        while ix < len(self.nodes):
+            node = self.nodes[ix]
+            ix += 1
+            state = {}
+            for name in slot_names(type(node)):
+                if hasattr(node, name):
+                    # `value` slots hold plain data (constants, format strings)
+                    state[name] = getattr(node, name) if name == 'value' else self.ref(getattr(node, name))
+            entries.append((type(node), state))
+        return entries, value
+
+    @staticmethod
+    def load(dumped: Tuple[Entries, object]):
+        entries, value = dumped
+        return resolve(NodeTable.load_nodes(entries), value)
+
+    @staticmethod
+    def load_nodes(entries: Entries) -> List[Node]:
+        """The nodes of a dumped table, in the order of their indexes."""
+        nodes = [object.__new__(cls) for cls, _ in entries]
+        for node, (_, state) in zip(nodes, entries):
+            for name, item in state.items():
+                setattr(node, name, item if name == 'value' else resolve(nodes, item))
+        return nodes
+
+
+def resolve(nodes: List[Node], item):
+    """Replace each `NodeRef` in item by the node it stands for."""
+    if type(item) is NodeRef:
+        return nodes[item]
+    if type(item) is list:
+        return [resolve(nodes, element) for element in item]
+    if type(item) is tuple:
+        return tuple(resolve(nodes, element) for element in item)
+    if type(item) is dict:
+        return {resolve(nodes, key): resolve(nodes, element) for key, element in item.items()}
+    return item
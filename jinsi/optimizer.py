@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from typing import Hashable, Optional, Set, Tuple
+
+from .analysis import dependencies
+from .locations import Location
+from .nodes import *
+from .util import freeze
+
+
+class ConstantFolder:
+    """Replaces subtrees which do not depend on any variable by the value they evaluate to.
+
+    Templates bound by `::let` are only folded if they are referenced, so unused definitions
+    do not cost anything. Subtrees that fail to evaluate are left as they are and will raise
+    when they are actually evaluated.
+
+    Folded values are interned: equal values (and equal parts of values) which render identically are
+    represented by one shared object, so repeated blocks of a template are kept in memory only once."""
+
+    def __init__(self, locations: Optional[Dict[Node, Location]] = None, interned: Optional[Dict] = None):
+        self.env = Environment()
+        self.locations = locations
+        self.interned = {} if interned is None else interned
+        self._visited: Set[Node] = set()
+
+    def intern(self, value: Value) -> Value:
+        return self._intern(value)[0]
+
+    def _intern(self, value: Value) -> Tuple[Value, Optional[Hashable]]:
+        if isinstance(value, dict):
+            items = [(k, _freeze_key(k), self._intern(v)) for k, v in value.items()]
+            if any(k_key is None or v_key is None for _, k_key, (_, v_key) in items):
+                return {k: v for k, _, (v, _) in items}, None
+            key = dict, tuple((k_key, v_key) for _, k_key, (_, v_key) in items)
+            shared = self.interned.get(key)
+            if shared is None:
+                shared = self.interned[key] = {k: v for k, _, (v, _) in items}
+            return shared, key
+        if isinstance(value, list):
+            items = [self._intern(item) for item in value]
+            if any(item_key is None for _, item_key in items):
+                return [item for item, _ in items], None
+            key = list, tuple(item_key for _, item_key in items)
+            shared = self.interned.get(key)
+            if shared is None:
+                shared = self.interned[key] = [item for item, _ in items]
+            return shared, key
+        key = _freeze_key(value)
+        if key is None:
+            return value, None
+        return self.interned.setdefault(key, value), key
+
+    def fold(self, node: Node) -> Node:
+        if isinstance(node, (Constant, Empty)):
+            return node
+        deps = dependencies(node)
+        if not deps.dyn and not deps.env:
+            # noinspection PyBroadException
+            try:
+                constant = Constant(node.parent, self.intern(node.evaluate(self.env)))
+            except Exception:
+                pass
+            else:
+                if self.locations is not None and node in self.locations:
+                    self.locations[constant] = self.locations.pop(node)
+                return constant
+        self._fold_children(node)
+        return node
+
+    def _fold_let(self, node: Node, name: str):
+        current = node
+        while not isinstance(current, Empty):
+            if isinstance(current, Let) and name in current.let:
+                target = current.let[name]
+                if target not in self._visited:
+                    self._visited.add(target)
+                    current.let[name] = self.fold(target)
+                return
+            if isinstance(current, Each) and current.target == name:
+                return
+            current = current.parent
+
+    def _fold_all(self, nodes: List[Node]):
+        for ix, node in enumerate(nodes):
+            nodes[ix] = self.fold(node)
+
+    def _fold_values(self, nodes: Dict[str, Node]):
+        for key, node in nodes.items():
+            nodes[key] = self.fold(node)
+
+    def _fold_children(self, node: Node):
+        if isinstance(node, GetLet):
+            self._fold_let(node, node.path[0])
+        elif isinstance(node, Format):
+            for ix, part in enumerate(node.parts):
+                if isinstance(part, Node):
+                    node.parts[ix] = self.fold(part)
+        elif isinstance(node, Let):
+            self._fold_values(node.env)
+            node.body = self.fold(node.body)
+        elif isinstance(node, Else):
+            node.body = self.fold(node.body)
+            node.otherwise = self.fold(node.otherwise)
+        elif isinstance(node, Object):
+            self._fold_values(node.formats)
+            self._fold_values(node.children)
+        elif isinstance(node, Sequence):
+            self._fold_all(node.elements)
+        elif isinstance(node, FunctionApplication):
+            self._fold_all(node.args)
+        elif isinstance(node, Application):
+            self._fold_values(node.kwargs)
+            self._fold_let(node, node.template)
+        elif isinstance(node, Each):
+            if node.source[:1] != "$":
+                self._fold_let(node.parent, node.source)
+            node.body = self.fold(node.body)
+        elif isinstance(node, When):
+            node.when = self.fold(node.when)
+            node.then = self.fold(node.then)
+            node.else_ = self.fold(node.else_)
+        elif isinstance(node, (All, Any)):
+            self._fold_all(node.nodes)
+        elif isinstance(node, Case):
+            node.cases = [(self.fold(condition), self.fold(action)) for condition, action in node.cases]
+        elif isinstance(node, Match):
+            node.condition = self.fold(node.condition)
+            self._fold_values(node.values)
+
+
+def _freeze_key(value: Value) -> Optional[Hashable]:
+    try:
+        return freeze(value)
+    except TypeError:
+        return None
+
+
+def fold_constants(
+        node: Node, *,
+        locations: Optional[Dict[Node, Location]] = None,
+        interned: Optional[Dict] = None,
+) -> Node:
+    """Fold all static subtrees of a parsed template into constants.
+
+    If locations are given, folded subtrees pass their location on to the constant replacing them.
+    Values are interned in the given dictionary, pass the same one to share values across documents."""
+    return ConstantFolder(locations, interned).fold(node)
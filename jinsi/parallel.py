@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import pickle
+import uuid
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from .environment import Environment
+from .nodes import Each, Empty, Node
+from .nodetable import NodeRef, NodeTable
+from .util import LRUCache
+from .value import Value
+
+
+class _Shipment(NamedTuple):
+    """A document dumped into a node table, as sent to worker processes."""
+    token: str
+    dumped: bytes
+    index: Dict[int, int]
+
+
+_shipments: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# the documents loaded in this process, by token
+_installed: Dict[str, List[Node]] = {}
+_received = LRUCache(maxsize=16)
+
+
+def _shipment(node: Node) -> _Shipment:
+    """The shipment of the document containing node, dumped once per process."""
+    while not isinstance(node.parent, Empty):
+        node = node.parent
+    shipment = _shipments.get(node)
+    if shipment is None:
+        table = NodeTable()
+        entries, _ = table.dump(node)
+        dumped = pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+        shipment = _shipments[node] = _Shipment(uuid.uuid4().hex, dumped, table.index)
+    return shipment
+
+
+def _install(shipments: Iterable[Tuple[str, bytes]]):
+    for token, dumped in shipments:
+        _installed[token] = NodeTable.load_nodes(pickle.loads(dumped))
+
+
+def _document(token: str, dumped: Optional[bytes]) -> List[Node]:
+    nodes = _installed.get(token)
+    if nodes is None:
+        nodes = _received.get(token)
+    if nodes is None:
+        nodes = NodeTable.load_nodes(pickle.loads(dumped))
+        _received.put(token, nodes)
+    return nodes
+
+
+class TemplateExecutor(ProcessPoolExecutor):
+    """A process pool whose workers load the given documents once, when they start."""
+
+    def __init__(self, documents: Iterable[Node], max_workers: Optional[int] = None):
+        shipments = [_shipment(node) for node in documents]
+        super().__init__(
+            max_workers=max_workers,
+            initializer=_install,
+            initargs=([(shipment.token, shipment.dumped) for shipment in shipments],),
+        )
+        self.tokens: FrozenSet[str] = frozenset(shipment.token for shipment in shipments)
+
+
+def evaluate_chunks(each: Each, env: Environment, entries: List[Value], chunk_size: int) -> List[Value]:
+    """Evaluate the body of a loop for chunks of entries in the executor of the environment, keeping their order.
+
+    Threads evaluate the loop itself. Worker processes load the document of the loop once, when they start
+    if the executor is a `TemplateExecutor` for it, or else from the first chunk they receive; chunks refer
+    to it by a token and carry only the index of the loop, the bindings and the entries."""
+    executor = env.executor
+    chunks = [entries[ix:ix + chunk_size] for ix in range(0, len(entries), chunk_size)]
+    if isinstance(executor, ThreadPoolExecutor):
+        bindings = env.bindings()
+        futures = [executor.submit(_evaluate_entries, each, bindings, chunk) for chunk in chunks]
+    else:
+        shipment = _shipment(each)
+        dumped = None if shipment.token in getattr(executor, 'tokens', ()) else shipment.dumped
+        bindings = {
+            NodeRef(shipment.index[id(key)]) if isinstance(key, Node) else key: value
+            for key, value in env.bindings().items()
+        }
+        ix = shipment.index[id(each)]
+        futures = [executor.submit(_evaluate_chunk, shipment.token, dumped, ix, bindings, chunk) for chunk in chunks]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+
+def _evaluate_entries(each: Each, bindings: Dict, entries: List[Value]) -> List[Value]:
+    env = Environment()
+    env.dyn = bindings
+    return each.evaluate_entries(env, entries)
+
+
+def _evaluate_chunk(
+        token: str, dumped: Optional[bytes], each: int, bindings: Dict, entries: List[Value],
+) -> List[Value]:
+    nodes = _document(token, dumped)
+    bindings = {nodes[key] if type(key) is NodeRef else key: value for key, value in bindings.items()}
+    return _evaluate_entries(nodes[each], bindings, entries)
@@ -1,25 +1,41 @@
 from __future__ import annotations
 
+import os
 import re
 from datetime import date, datetime
 from decimal import Decimal
 from inspect import getattr_static
-
-import yaml
+from typing import Optional
 
 from .exceptions import MalformedEachError, MalformedNameError, NoParseError, NoSuchFunctionError
 from .expressions import parse_expression
 from .functions import Functions
+from .includes import IncludeResolver, get_resolver
 from .nodes import *
-from .util import merge
+from .util import merge, split_format
 
 
 # noinspection PyMethodMayBeStatic
 class Parser:
 
-    def __init__(self):
+    def __init__(self, *, source: Optional[str] = None, resolver: Optional[IncludeResolver] = None):
         self.name_regex = "^[a-z]([_-]?[a-z0-9])*$"
         self.path = []
+        self.source = source
+        self.resolver = get_resolver() if resolver is None else resolver
+        self.includes: List[str] = []
+        # values of folded constants, interned across all documents parsed with this parser
+        self.interned: Dict = {}
+
+    def derived(self, obj: Dict, derived: Dict) -> Dict:
+        """Called with each mapping built from the entries of another mapping, returns the new mapping."""
+        return derived
+
+    def parsed(self, obj: Value, node: Node) -> Node:
+        """Called with each mapping or sequence and the node parsed from it, returns the node.
+
+        Being called after the children have been parsed, this does not add to the depth of the recursion."""
+        return node
 
     def check_name(self, name):
         if not re.match(self.name_regex, name):
@@ -40,26 +56,28 @@ class Parser:
                 raise NoParseError()
             del obj['::include']
             docs = [obj]
+            stack = () if self.source is None else (os.path.abspath(self.source),)
             for include in includes:
-                with open(include) as f:
-                    docs.append(yaml.safe_load(f))
-            obj = merge(*docs)
+                included, files = self.resolver.load(include, base=self.source, stack=stack)
+                self.includes.extend(files)
+                docs.extend(included)
+            obj = self.derived(obj, merge(*docs))
         key_set = set(obj.keys())
         if '::let' in obj:
-            return self.parse_let(obj, parent)
+            return self.parsed(obj, self.parse_let(obj, parent))
         if '::else' in obj:
-            return self.parse_else(obj, parent)
+            return self.parsed(obj, self.parse_else(obj, parent))
         if key_set == {'::all'}:
-            return self.parse_all(obj['::all'], parent)
+            return self.parsed(obj, self.parse_all(obj['::all'], parent))
         if key_set == {'::any'}:
-            return self.parse_any(obj['::any'], parent)
+            return self.parsed(obj, self.parse_any(obj['::any'], parent))
         if key_set == {'::when', '::then'} or key_set == {'::when', '::then', '::else'}:
-            return self.parse_conditional(obj, parent)
+            return self.parsed(obj, self.parse_conditional(obj, parent))
         if key_set == {'::case'}:
-            return self.parse_case(obj['::case'], parent)
+            return self.parsed(obj, self.parse_case(obj['::case'], parent))
         if len(key_set) == 1 and next(iter(key_set)).startswith('::match '):
             k = next(iter(key_set))
-            return self.parse_match(k, obj[k], parent)
+            return self.parsed(obj, self.parse_match(k, obj[k], parent))
         for keyword in ('::all', '::any', '::when', '::then', '::case'):
             if keyword in key_set:
                 raise NoParseError()
@@ -81,17 +99,18 @@ class Parser:
                     nodes.append(self.parse_function_application(key, value, parent))
             else:
                 remaining[key] = value
+        remaining = self.derived(obj, remaining)
 
         if not remaining and len(nodes) == 1:
-            return nodes[0]
+            return self.parsed(obj, nodes[0])
         if not nodes:
-            return self.parse_object(remaining, parent)
+            return self.parsed(obj, self.parse_object(remaining, parent))
         nodes.append(self.parse_object(remaining, parent))
         merge_node = FunctionApplication(parent, function=Functions.merge)
         for node in nodes:
             node.parent = merge_node
         merge_node.args = nodes
-        return merge_node
+        return self.parsed(obj, merge_node)
 
     def parse_constant(self, obj, parent: Node) -> Node:
         return Constant(parent, obj)
@@ -113,7 +132,7 @@ class Parser:
                         node.let[var_key] = self.parse_node(var_value, node)
                 continue
             remainder[key] = value
-        node.body = self.parse_node(remainder, node)
+        node.body = self.parse_node(self.derived(obj, remainder), node)
         return node
 
     def parse_conditional(self, obj, parent: Node) -> Node:
@@ -172,20 +191,20 @@ class Parser:
                 node.otherwise = self.parse_node(value, node)
                 continue
             remainder[key] = value
-        node.body = self.parse_node(remainder, node)
+        node.body = self.parse_node(self.derived(obj, remainder), node)
         return node
 
     def parse_object(self, obj, parent: Node) -> Node:
         node = Object(parent)
         for key, value in obj.items():
-            node.children[key] = self.parse_node(value, node)
-        return node
+            node.add_child(key, self.parse_node(value, node))
+        return self.parsed(obj, node)
 
     def parse_sequence(self, obj, parent: Node) -> Node:
         seq = Sequence(parent)
         for item in obj:
             seq.elements.append(self.parse_node(item, seq))
-        return seq
+        return self.parsed(obj, seq)
 
     def parse_function_application(self, key: str, args, parent: Node) -> Node:
         name = key[2:]
@@ -238,5 +257,7 @@ class Parser:
         each.body = self.parse_node(value, each)
         return each
 
-    def parse_format(self, value, parent: Node) -> Node:
+    def parse_format(self, value: str, parent: Node) -> Node:
+        if len(split_format(value)) == 1:
+            return Constant(parent, value)
         return Format(parent, value)
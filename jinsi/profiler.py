@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from . import nodes
+from .locations import Location, locate
+from .nodes import *
+
+
+def _children(node: Node) -> Iterator[Tuple[Optional[str], Node]]:
+    """The children of a node, each with the path segment leading to it (None if it shares the path of its parent)."""
+    if isinstance(node, Let):
+        for key, child in node.env.items():
+            yield f"::let/${key}", child
+        for key, child in node.let.items():
+            yield f"::let/{key}", child
+        yield None, node.body
+    elif isinstance(node, Else):
+        yield None, node.body
+        yield "::else", node.otherwise
+    elif isinstance(node, Object):
+        for key_format in node.formats.values():
+            yield None, key_format
+        for key, child in node.children.items():
+            yield str(key), child
+    elif isinstance(node, Sequence):
+        for ix, child in enumerate(node.elements):
+            yield str(ix), child
+    elif isinstance(node, FunctionApplication):
+        name = node.function.__name__.rstrip("_")
+        for ix, child in enumerate(node.args):
+            yield f"::{name}/{ix}", child
+    elif isinstance(node, Application):
+        for key, child in node.kwargs.items():
+            yield f"::call {node.template}/${key}", child
+    elif isinstance(node, Each):
+        yield f"::each {node.source} as {node.target}", node.body
+    elif isinstance(node, When):
+        yield "::when", node.when
+        yield "::then", node.then
+        yield "::else", node.else_
+    elif isinstance(node, All):
+        for ix, child in enumerate(node.nodes):
+            yield f"::all/{ix}", child
+    elif isinstance(node, Any):
+        for ix, child in enumerate(node.nodes):
+            yield f"::any/{ix}", child
+    elif isinstance(node, Case):
+        for ix, (condition, action) in enumerate(node.cases):
+            yield f"::case/{ix}", condition
+            yield f"::case/{ix}", action
+    elif isinstance(node, Match):
+        yield "::match", node.condition
+        for key, child in node.values.items():
+            yield f"::match/{key}", child
+    elif isinstance(node, Format):
+        for part in node.parts:
+            if isinstance(part, Node):
+                yield None, part
+
+
+def node_paths(document: Node, *, prefix: str = "") -> Dict[Node, str]:
+    """Map every node of a parsed document to the path of the YAML/JSON value it was parsed from."""
+    result: Dict[Node, str] = {}
+    todo: List[Tuple[Node, str]] = [(document, prefix + "/")]
+    while todo:
+        node, path = todo.pop()
+        if isinstance(node, Empty) or node in result:
+            continue
+        result[node] = path
+        for segment, child in _children(node):
+            if segment is None:
+                todo.append((child, path))
+            else:
+                todo.append((child, path.rstrip("/") + "/" + segment))
+    return result
+
+
+def _profiled_codes():
+    codes = set()
+    for cls in vars(nodes).values():
+        if isinstance(cls, type) and issubclass(cls, Node):
+            for name in ('evaluate', 'load'):
+                func = cls.__dict__.get(name)
+                if func is not None and cls is not Node:
+                    codes.add(func.__code__)
+    return frozenset(codes)
+
+
+class NodeStats:
+    __slots__ = ('calls', 'cumulative', 'own')
+
+    def __init__(self):
+        self.calls = 0
+        self.cumulative = 0.0
+        self.own = 0.0
+
+
+class Profiler:
+    """Records call counts, cumulative and self time for each node of some templates.
+
+    Use it as a context manager around evaluating the documents. Only nodes of the given documents are
+    recorded, the time spent in anything else is attributed to the node it was invoked from."""
+
+    def __init__(
+            self, documents: Iterable[Node] = (), *,
+            source: Optional[str] = None,
+            locations: Optional[Dict[Node, Location]] = None,
+    ):
+        self.labels: Dict[Node, str] = {}
+        self.stats: Dict[Node, NodeStats] = {}
+        self.stacks: Dict[Tuple[Node, ...], float] = {}
+        self._codes = _profiled_codes()
+        self._stack: List[List] = []
+        self._active: Dict[Node, int] = {}
+        self._previous = None
+        self.add(documents, source=source, locations=locations)
+
+    def add(
+            self, documents: Iterable[Node], *,
+            source: Optional[str] = None,
+            locations: Optional[Dict[Node, Location]] = None,
+    ):
+        """Register the documents of a template, labelling their nodes by source, document and path.
+
+        If the locations of the nodes are known, labels include the line and column too."""
+        for ix, document in enumerate(documents):
+            for node, path in node_paths(document, prefix=f"{source or '<string>'}#{ix}").items():
+                label = f"{type(node).__name__} {path}"
+                location = None if locations is None else locate(locations, node)
+                if location is not None:
+                    label = f"{label} ({location.line}:{location.column})"
+                self.labels[node] = label
+
+    def __enter__(self) -> Profiler:
+        self._previous = sys.getprofile()
+        sys.setprofile(self._hook)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sys.setprofile(self._previous)
+        self._previous = None
+
+    def _hook(self, frame, event, _arg):
+        if event == 'call':
+            if frame.f_code in self._codes:
+                node = frame.f_locals.get('self')
+                if node in self.labels:
+                    self._active[node] = self._active.get(node, 0) + 1
+                    self._stack.append([node, frame, time.perf_counter(), 0.0])
+        elif event == 'return':
+            if self._stack and self._stack[-1][1] is frame:
+                node, _, start, children = self._stack.pop()
+                elapsed = time.perf_counter() - start
+                stats = self.stats.get(node)
+                if stats is None:
+                    stats = self.stats[node] = NodeStats()
+                stats.calls += 1
+                stats.own += elapsed - children
+                self._active[node] -= 1
+                if not self._active[node]:
+                    stats.cumulative += elapsed
+                stack = tuple(entry[0] for entry in self._stack) + (node,)
+                self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - children
+                if self._stack:
+                    self._stack[-1][3] += elapsed
+
+    def report(self, stream: TextIO = None, *, limit: int = 40):
+        """Print the nodes which took the most time by themselves."""
+        if stream is None:
+            stream = sys.stderr
+        entries = sorted(self.stats.items(), key=lambda item: item[1].own, reverse=True)
+        print(f"{'calls':>10} {'cumtime':>10} {'selftime':>10}  node", file=stream)
+        for node, stats in entries[:limit]:
+            print(
+                f"{stats.calls:>10} {stats.cumulative:>10.4f} {stats.own:>10.4f}  {self.labels[node]}",
+                file=stream)
+
+    def write_stacks(self, stream: TextIO):
+        """Write self times in microseconds as folded stacks, as read by flamegraph.pl and speedscope."""
+        for stack, seconds in self.stacks.items():
+            frames = ";".join(self.labels[node].replace(";", ":") for node in stack)
+            print(f"{frames} {round(seconds * 1_000_000)}", file=stream)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from .analysis import dependencies
+from .environment import Environment
+from .jsonutil import dumpjson
+from .nodes import *
+from .template import CompiledTemplate
+from .util import LRUCache, copy_value, freeze
+from .yamlutil import dumpyaml
+
+_missing = object()
+
+
+class Change(NamedTuple):
+    """A value which differs from the previous render, at a path within a document."""
+    document: int
+    path: Tuple
+    old: Value
+    new: Value
+
+
+class _Entry:
+    """The value a node evaluated to in the previous render, with the entries of its children."""
+    __slots__ = ('value', 'children', 'env')
+
+    def __init__(self, value: Value, children=None, env: Optional[Dict[str, Value]] = None):
+        self.value = value
+        self.children = children
+        self.env = env
+
+
+class RenderSession:
+    """Renders a template repeatedly, re-evaluating only the parts whose inputs changed since the last render.
+
+    Objects, sequences and `::let` are descended into; any other node is either reused as a whole, if none
+    of the args and environment variables it reads changed, or evaluated again (reusing the results of
+    `::call`s which are kept across renders). Args are compared like memoized results are, values which are
+    equal but render differently (like 1 and True) are different. Args must not be modified in place between
+    renders. Values are copied when they are handed out, internally they share structure with earlier ones."""
+
+    def __init__(self, template: CompiledTemplate, *, memo_size: int = Environment.memo_size):
+        self.template = template
+        self.changes: List[Change] = []
+        self._memo = LRUCache(maxsize=memo_size)
+        self._args: Optional[Dict] = None
+        self._vars: Dict[str, Optional[str]] = {}
+        self._entries: List[Optional[_Entry]] = [None] * len(template)
+
+    def evaluate(self, args: Dict = None) -> List[Value]:
+        """Evaluate all documents for the given args, recording what changed in `changes`."""
+        return [copy_value(value) for value in self._evaluate(args)]
+
+    def _evaluate(self, args: Optional[Dict]) -> List[Value]:
+        args = dict(args or {})
+        names = self.template.dependencies().env
+        variables = {name: Environment.get_var(name) for name in names}
+        if self._args is None:
+            changed = changed_vars = None
+        else:
+            changed = _changed(self._args, args)
+            changed_vars = _changed(self._vars, variables)
+        self.changes = []
+        values = []
+        for ix, node in enumerate(self.template.documents):
+            env = Environment(**args)
+            env.memo = self._memo
+            entry = self._update(node, env, self._entries[ix], changed, changed_vars, (ix,))
+            self._entries[ix] = entry
+            values.append(entry.value)
+        self._args = args
+        self._vars = variables
+        return values
+
+    def render(self, args: Dict = None, *, as_json: bool = False) -> List[str]:
+        """Render all documents for the given args, see `evaluate`."""
+        if as_json:
+            return [dumpjson(value) for value in self._evaluate(args)]
+        return [dumpyaml(value) for value in self._evaluate(args)]
+
+    def _update(
+            self, node: Node, env: Environment, prev: Optional[_Entry],
+            changed: Optional[FrozenSet], changed_vars: Optional[FrozenSet], path: Tuple,
+    ) -> _Entry:
+        if prev is not None and changed is not None:
+            deps = dependencies(node)
+            if deps.dyn.isdisjoint(changed) and deps.env.isdisjoint(changed_vars):
+                return prev
+        if isinstance(node, Object):
+            value = {}
+            children = {}
+            for raw_key, child in node.children.items():
+                key = node.formats[raw_key].evaluate(env) if raw_key in node.formats else raw_key
+                child_prev = None
+                if prev is not None and raw_key in prev.children:
+                    prev_key, child_prev = prev.children[raw_key]
+                    if prev_key != key:
+                        child_prev = None
+                entry = self._update(child, env, child_prev, changed, changed_vars, path + (key,))
+                children[raw_key] = (key, entry)
+                value[key] = entry.value
+            if prev is not None and prev.value.keys() != value.keys():
+                self._record(path, prev.value, value)
+            return _Entry(value, children)
+        if isinstance(node, Sequence):
+            children = []
+            for ix, element in enumerate(node.elements):
+                element_prev = None if prev is None else prev.children[ix]
+                children.append(self._update(element, env, element_prev, changed, changed_vars, path + (ix,)))
+            return _Entry([entry.value for entry in children], children)
+        if isinstance(node, Let):
+            my_env = {key: value_node.evaluate(env) for key, value_node in node.env.items()}
+            body_changed = changed
+            if changed is not None:
+                body_changed = changed.difference(my_env.keys()).union(
+                    key for key, value in my_env.items()
+                    if prev is None or not _same(prev.env.get(key, _missing), value))
+            entry = self._update(
+                node.body, env.with_env(my_env), None if prev is None else prev.children,
+                body_changed, changed_vars, path)
+            return _Entry(entry.value, entry, my_env)
+        value = node.evaluate(env)
+        if prev is not None and not _same(prev.value, value):
+            self._record(path, prev.value, value)
+        return _Entry(value)
+
+    def _record(self, path: Tuple, old: Value, new: Value):
+        self.changes.append(Change(path[0], path[1:], copy_value(old), copy_value(new)))
+
+
+def _same(old: Value, new: Value) -> bool:
+    """Whether two values render identically, compared as `evaluate_memoized` compares its keys."""
+    if old is new:
+        return True
+    try:
+        return freeze(old) == freeze(new)
+    except TypeError:
+        return False
+
+
+def _changed(old: Dict, new: Dict) -> FrozenSet:
+    return frozenset(
+        key for key in old.keys() | new.keys()
+        if not _same(old.get(key, _missing), new.get(key, _missing))
+    )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .analysis import NONE, Dependencies, dependencies
+from .closures import compile_closure
+from .environment import Environment
+from .jsonutil import dumpjson
+from .locations import Location, locate
+from .nodes import Empty, Node
+from .nodetable import NodeTable
+from .parallel import TemplateExecutor
+from .profiler import Profiler
+from .util import copy_value, treat
+from .value import Value
+from .writer import DocumentWriter
+from .yamlutil import dumpyaml
+
+
+class CompiledTemplate:
+    """A parsed template that can be rendered many times with different arguments.
+
+    Instances are immutable and can be pickled, so a template can be compiled once
+    and shipped to worker processes or stored on disk.
+
+    The engine decides how documents are evaluated: "tree" walks the nodes, "closure" compiles
+    them into nested Python closures once, on first use, which evaluate to the same values faster."""
+
+    __slots__ = ('_documents', '_source', '_locations', '_includes', '_engine', '_closures', '_frozen')
+
+    engines = ("tree", "closure")
+
+    def __init__(
+            self, documents: Iterable[Node], *,
+            source: Optional[str] = None,
+            locations: Optional[Dict[Node, Location]] = None,
+            includes: Iterable[str] = (),
+            engine: str = "tree",
+    ):
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(self.engines)}")
+        self._documents = tuple(documents)
+        self._source = source
+        self._locations = locations
+        self._includes = tuple(dict.fromkeys(includes))
+        self._engine = engine
+        self._closures = None
+        self._frozen = True
+
+    def __setattr__(self, key, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        object.__setattr__(self, key, value)
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getstate__(self):
+        return NodeTable().dump((self._documents, self._source, self._locations, self._includes, self._engine))
+
+    def __setstate__(self, state):
+        documents, source, locations, includes, engine = NodeTable.load(state)
+        self._documents = documents
+        self._source = source
+        self._locations = locations
+        self._includes = includes
+        self._engine = engine
+        self._closures = None
+        self._frozen = True
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} source={self._source!r} documents={len(self._documents)}>"
+
+    @property
+    def documents(self) -> Tuple[Node, ...]:
+        return self._documents
+
+    @property
+    def source(self) -> Optional[str]:
+        return self._source
+
+    @property
+    def engine(self) -> str:
+        return self._engine
+
+    @property
+    def includes(self) -> Tuple[str, ...]:
+        """The files included via `::include` while parsing the template."""
+        return self._includes
+
+    def dependencies(self, node: Optional[Node] = None) -> Dependencies:
+        """The `$` variables and environment variables which the given node or all documents read.
+
+        For nodes inside of an `::each`, the loop variable is included as the `Each` node binding it."""
+        if node is not None:
+            return dependencies(node)
+        result = NONE
+        for document in self._documents:
+            result = result | dependencies(document)
+        return result
+
+    def relevant_args(self, args: Dict) -> Dict:
+        """The subset of args that can influence the rendered documents, e.g. to use it as a cache key."""
+        names = self.dependencies().args
+        return {key: value for key, value in args.items() if key in names}
+
+    @property
+    def locations(self) -> Optional[Dict[Node, Location]]:
+        """Where each node was parsed from, if the template was compiled with `locations=True`."""
+        return self._locations
+
+    def locate(self, node: Node) -> Optional[Location]:
+        """Where a node, or its closest ancestor which has a location, was parsed from."""
+        if self._locations is None:
+            return None
+        return locate(self._locations, node)
+
+    def profiler(self) -> Profiler:
+        """Create a profiler for the documents of this template, see `evaluate`."""
+        return Profiler(self._documents, source=self._source, locations=self._locations)
+
+    def executor(self, max_workers: Optional[int] = None) -> TemplateExecutor:
+        """Create a process pool for evaluating the large `::each` loops of this template, see `evaluate`.
+
+        Its workers load the documents when they start, any other process pool receives a document with
+        the first chunk of a loop each worker evaluates."""
+        return TemplateExecutor(self._documents, max_workers=max_workers)
+
+    def evaluate(
+            self, *,
+            args: Dict = None,
+            executor: Optional[Executor] = None,
+            profiler: Optional[Profiler] = None,
+    ) -> Iterator[Value]:
+        """Evaluate each document and return each value one by one.
+
+        Folded constants are shared between renders, so each value is copied when it is handed out and
+        may be modified freely. If an executor (usually one created by `executor`) is given, large `::each`
+        loops are evaluated in chunks using it. If a profiler is given, the time spent in each node is
+        recorded in it (which requires walking the nodes, whatever the engine)."""
+        for value in self._evaluate(args, executor, profiler):
+            yield copy_value(value)
+
+    def _evaluate(
+            self, args: Optional[Dict], executor: Optional[Executor], profiler: Optional[Profiler],
+    ) -> Iterator[Value]:
+        """Like `evaluate`, but the values share structure with the template and must not be modified."""
+        if profiler is not None:
+            for node in self._documents:
+                env = self._environment(args, executor)
+                with profiler:
+                    value = node.evaluate(env=env)
+                yield value
+            return
+        for evaluate in self._evaluators():
+            yield evaluate(self._environment(args, executor))
+
+    def _evaluators(self) -> Tuple[Callable[[Environment], Value], ...]:
+        if self._engine == "tree":
+            return tuple(node.evaluate for node in self._documents)
+        if self._closures is None:
+            # a cache, compiling again yields the same closures
+            object.__setattr__(self, '_closures', tuple(compile_closure(node) for node in self._documents))
+        return self._closures
+
+    @staticmethod
+    def _environment(args: Optional[Dict], executor: Optional[Executor], numtype: type = float) -> Environment:
+        env = Environment(**(args or {}))
+        env.executor = executor
+        env.numtype = numtype
+        return env
+
+    def render(
+            self, *,
+            args: Dict = None,
+            as_json: bool = False,
+            executor: Optional[Executor] = None,
+            profiler: Optional[Profiler] = None,
+    ) -> Iterator[str]:
+        """Render each document and return each rendered string one by one."""
+        for value in self._evaluate(args, executor, profiler):
+            if as_json:
+                yield dumpjson(value)
+            else:
+                yield dumpyaml(value)
+
+    def render_document(self, ix: int, *, args: Dict = None, as_json: bool = False) -> str:
+        """Render only the document at this index, see `render`."""
+        value = self._evaluators()[ix](self._environment(args, None))
+        return dumpjson(value) if as_json else dumpyaml(value)
+
+    def render_into(
+            self, stream: TextIO, *,
+            args: Dict = None,
+            as_json: bool = False,
+            executor: Optional[Executor] = None,
+            profiler: Optional[Profiler] = None,
+    ):
+        """Render each document directly into a text stream, as JSON lines or YAML documents separated by `---`."""
+        self.write(DocumentWriter(stream, as_json=as_json), args=args, executor=executor, profiler=profiler)
+
+    def write(
+            self, writer: DocumentWriter, *,
+            args: Dict = None,
+            executor: Optional[Executor] = None,
+            profiler: Optional[Profiler] = None,
+    ):
+        """Render each document with a writer, which may be shared with other templates, see `render_into`."""
+        for value in self._evaluate(args, executor, profiler):
+            writer.write(value)
+
+    def load(
+            self, *,
+            args: Dict = None,
+            numtype: type = float,
+            executor: Optional[Executor] = None,
+            profiler: Optional[Profiler] = None,
+    ) -> Iterator[Value]:
+        """Load each document and return each value one by one.
+
+        Numbers are converted to `numtype` while the document is evaluated (by the tree engine)
+        or afterwards (by the closure engine)."""
+        if self._engine == "closure" and profiler is None:
+            for evaluate in self._evaluators():
+                value = evaluate(self._environment(args, executor, numtype))
+                yield value if isinstance(value, str) else treat(value, numtype=numtype)
+            return
+        for node in self._documents:
+            env = self._environment(args, executor, numtype)
+            if profiler is None:
+                yield node.load(env=env)
+            else:
+                with profiler:
+                    value = node.load(env=env)
+                yield value
+
+    def iterload(self, *, args: Dict = None, numtype: type = float) -> Iterator[Iterator[Value]]:
+        """Load each document lazily, returning an iterator over its top-level entries for each document.
+
+        The entries of a mapping are key-value pairs, the entries of a sequence are its elements.
+        Each entry is evaluated only when it is requested."""
+        for node in self._documents:
+            yield node.load_items(env=self._environment(args, None, numtype))
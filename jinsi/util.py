@@ -3,11 +3,13 @@ from __future__ import annotations
 import decimal
 import functools
 import hashlib
+import os
 import re
 import struct
+from collections import OrderedDict
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Callable, List, Optional, Union, Dict
+from typing import Callable, List, Optional, Tuple, Union, Dict
 
 from jinsi.exceptions import NoMergePossible
 
@@ -159,6 +161,46 @@ def cached_method(func):
     return wrapper
 
 
+class LRUCache:
+    """A mapping of bounded size which evicts the least recently used entry first."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+def freeze(value):
+    """Turn a value into a hashable key which is equal for values that render identically."""
+    if isinstance(value, dict):
+        return dict, tuple((freeze(k), freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return list, tuple(freeze(item) for item in value)
+    if isinstance(value, (Decimal, float)):
+        return type(value), str(value)
+    hash(value)
+    return type(value), value
+
+
 class Singleton(type):
     _instances = {}
 
@@ -178,18 +220,20 @@ def select(obj, *path, fallback=None):
     return current
 
 
+def split_format(value: str, _regex=re.compile(r"<<(\$?[a-zA-Z0-9-_]+(?:\.[a-zA-Z0-9-_]+)*)>>")) -> List[str]:
+    """Split a format string into literal text and placeholders, alternating and starting with literal text."""
+    return _regex.split(value)
+
+
 def substitute(thing, callback: Callable[[str], str]):
     if isinstance(thing, (type(None), bool, int, float)):
         return thing
     if isinstance(thing, str):
-        fs = re.split(r"<<(\$?[a-zA-Z0-9-_]+(\.[a-zA-Z0-9-_]+)*)>>", thing)
         result = []
-        ix = 0
-        for f in fs:
-            ix = (ix + 1) % 3
-            if ix == 2:
+        for ix, f in enumerate(split_format(thing)):
+            if ix % 2:
                 result.append(callback(f))
-            elif ix == 1:
+            else:
                 result.append(f)
         return "".join(result)
     elif isinstance(thing, list):
@@ -311,24 +355,46 @@ def convert_num(value, totype):
 
 
 def treat(value, *, numtype):
-    def rtreat(val):
-        if isinstance(val, (str, bool)) or val is None:
-            return val
-        if isinstance(val, dict):
-            for k in val:
-                val[k] = rtreat(val[k])
-            return val
-        if isinstance(val, list):
-            for i in range(0, len(val)):
-                val[i] = rtreat(val[i])
-            return val
-        if isinstance(val, (int, float, decimal.Decimal)):
-            return convert_num(val, numtype)
-        if isinstance(val, (date, datetime)):
-            return val
-        raise TypeError(f"Do not know how to process {val} of type {type(val)}")
-
-    return rtreat(value)
+    return _treat(value, numtype)
+
+
+# noinspection PyShadowingBuiltins
+def _treat(val, numtype, isinstance=isinstance, str=str, bool=bool, dict=dict, list=list):
+    if isinstance(val, str):
+        return val
+    if isinstance(val, dict):
+        return {k: _treat(v, numtype) for k, v in val.items()}
+    if isinstance(val, list):
+        return [_treat(v, numtype) for v in val]
+    if isinstance(val, bool) or val is None:
+        return val
+    if isinstance(val, (int, float, decimal.Decimal)):
+        return convert_num(val, numtype)
+    if isinstance(val, (date, datetime)):
+        return val
+    raise TypeError(f"Do not know how to process {val} of type {type(val)}")
+
+
+# noinspection PyShadowingBuiltins
+def copy_value(val, isinstance=isinstance, dict=dict, list=list):
+    """A copy of a value in which all mappings and sequences are new, anything else is shared."""
+    if isinstance(val, dict):
+        return {k: copy_value(v) for k, v in val.items()}
+    if isinstance(val, list):
+        return [copy_value(v) for v in val]
+    return val
 
 
 JsonValue = Union[type(None), bool, int, float, str, List['JsonValue'], Dict[str, 'JsonValue']]
+
+
+Stamp = Optional[Tuple[int, int]]
+
+
+def file_stamp(path: str) -> Stamp:
+    """The modification time and size of a file, or None if it can not be accessed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+from .api import compile_file
+from .template import CompiledTemplate
+from .util import Stamp, file_stamp
+
+
+class Watcher:
+    """Keeps compiled templates and the files they include in memory and recompiles the ones affected by changes.
+
+    Files are watched by polling their modification time and size, which works everywhere
+    without any additional dependency."""
+
+    def __init__(self, paths: List[str], *, _open=open):
+        self.paths = list(dict.fromkeys(paths))
+        self.templates: Dict[str, CompiledTemplate] = {}
+        self.errors: Dict[str, Exception] = {}
+        self._stamps: Dict[str, Stamp] = {}
+        self._open = _open
+        for path in self.paths:
+            self._compile(path)
+
+    def _compile(self, path: str):
+        self._stamps[path] = file_stamp(path)
+        try:
+            template = compile_file(path, _open=self._open)
+        except Exception as exc:
+            self.errors[path] = exc
+            return
+        self.errors.pop(path, None)
+        self.templates[path] = template
+        for include in template.includes:
+            if include not in self._stamps:
+                self._stamps[include] = file_stamp(include)
+
+    def files(self) -> List[str]:
+        """All files being watched, the templates as well as the files they include."""
+        return list(self._stamps)
+
+    def dependents(self, file: str) -> List[str]:
+        """The templates which need to be recompiled if the given file changes."""
+        return [
+            path for path in self.paths
+            if path == file or path in self.templates and file in self.templates[path].includes
+        ]
+
+    def poll(self) -> List[str]:
+        """Recompile the templates affected by files that changed since the last poll and return their paths.
+
+        Templates which fail to compile keep their previous version and the error is kept in `errors`."""
+        changed = []
+        for file, stamp in list(self._stamps.items()):
+            current = file_stamp(file)
+            if current != stamp:
+                self._stamps[file] = current
+                changed.append(file)
+        affected = list(dict.fromkeys(path for file in changed for path in self.dependents(file)))
+        for path in affected:
+            self._compile(path)
+        return affected
@@ -0,0 +1,35 @@
+from typing import TextIO
+
+from .jsonutil import dumpjson_into
+from .value import Value
+from .yamlutil import dumpyaml_into
+
+
+class DocumentWriter:
+    """Writes documents to a text stream, either as JSON lines or as YAML documents separated by `---`."""
+
+    def __init__(self, stream: TextIO, *, as_json: bool = False):
+        self.stream = stream
+        self.as_json = as_json
+        self.count = 0
+
+    def _begin(self):
+        self.count += 1
+        if self.count > 1 and not self.as_json:
+            self.stream.write("---\n")
+
+    def write(self, value: Value):
+        """Serialize a value directly into the stream."""
+        self._begin()
+        if self.as_json:
+            dumpjson_into(value, self.stream)
+            self.stream.write("\n")
+        else:
+            dumpyaml_into(value, self.stream)
+
+    def write_rendered(self, doc: str):
+        """Write a document which has already been rendered to a string."""
+        self._begin()
+        self.stream.write(doc)
+        if self.as_json or doc[-1:] != "\n":
+            self.stream.write("\n")
@@ -1,5 +1,6 @@
 import re
 from decimal import Decimal
+from typing import Any, Dict, Iterator, List, NamedTuple, TextIO, Tuple, Union
 
 import yaml
 import yaml.composer
@@ -30,8 +31,8 @@ for ch, vs in yaml.resolver.Resolver.yaml_implicit_resolvers.items():
     )
 
 
-class Loader(yaml.reader.Reader, yaml.scanner.Scanner, yaml.parser.Parser,
-             yaml.composer.Composer, yaml.constructor.SafeConstructor, Resolver):
+class PyLoader(yaml.reader.Reader, yaml.scanner.Scanner, yaml.parser.Parser,
+               yaml.composer.Composer, yaml.constructor.SafeConstructor, Resolver):
 
     def __init__(self, stream):
         yaml.reader.Reader.__init__(self, stream)
@@ -42,12 +43,32 @@ class Loader(yaml.reader.Reader, yaml.scanner.Scanner, yaml.parser.Parser,
         Resolver.__init__(self)
 
 
+loaders = [PyLoader]
+
+if yaml.__with_libyaml__:
+    import yaml.cyaml
+
+    class CLoader(yaml.cyaml.CParser, yaml.constructor.SafeConstructor, Resolver):
+        """Same as `PyLoader`, but scans and parses using libyaml."""
+
+        def __init__(self, stream):
+            yaml.cyaml.CParser.__init__(self, stream)
+            yaml.constructor.SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+
+    loaders.append(CLoader)
+    Loader = CLoader
+else:
+    Loader = PyLoader
+
+
 def dec_constructor(loader, node):
     value = loader.construct_scalar(node)
     return Decimal(value)
 
 
-yaml.add_constructor('!dec', dec_constructor, Loader)
+for _loader in loaders:
+    yaml.add_constructor('!dec', dec_constructor, _loader)
 
 
 def str_node(value: str) -> yaml.ScalarNode:
@@ -114,15 +135,16 @@ aws_cloudformation_intrinsic_functions = [
     "Condition",
 ]
 
-for func in aws_cloudformation_intrinsic_functions:
-    yaml.add_constructor(f"!{func}", aws_cloudformation_intrinsic_function, Loader)
+for _loader in loaders:
+    for func in aws_cloudformation_intrinsic_functions:
+        yaml.add_constructor(f"!{func}", aws_cloudformation_intrinsic_function, _loader)
 
 
-class Dumper(yaml.Dumper):
+class RepresenterMixin:
 
     def __init__(self, *args, **kwargs):
         kwargs['sort_keys'] = False
-        super(Dumper, self).__init__(*args, **kwargs)
+        super().__init__(*args, **kwargs)
 
     def represent_str(self, data):
         if '\n' in data:
@@ -131,19 +153,39 @@ class Dumper(yaml.Dumper):
             return self.represent_scalar('tag:yaml.org,2002:str', data)
 
     def represent_dec(self, data):
+        if not data.is_finite():
+            return self.represent_float(float(data))
         s = str(data)
+        if 'E' in s:
+            s = format(data, 'f')
         if '.' in s:
             tag = 'tag:yaml.org,2002:float'
         else:
             tag = 'tag:yaml.org,2002:int'
-        return self.represent_scalar(tag, str(data))
+        return self.represent_scalar(tag, s)
 
     def ignore_aliases(self, data):
         return True
 
 
-yaml.add_representer(Decimal, Dumper.represent_dec, Dumper=Dumper)
-yaml.add_representer(str, Dumper.represent_str, Dumper=Dumper)
+class PyDumper(RepresenterMixin, yaml.Dumper):
+    pass
+
+
+dumpers = [PyDumper]
+
+if yaml.__with_libyaml__:
+    class CDumper(RepresenterMixin, yaml.cyaml.CDumper):
+        """Same as `PyDumper`, but emits using libyaml."""
+
+    dumpers.append(CDumper)
+    Dumper = CDumper
+else:
+    Dumper = PyDumper
+
+for _dumper in dumpers:
+    yaml.add_representer(Decimal, _dumper.represent_dec, Dumper=_dumper)
+    yaml.add_representer(str, _dumper.represent_str, Dumper=_dumper)
 
 
 def dumpyaml(data) -> str:
@@ -154,9 +196,93 @@ def dumpyaml(data) -> str:
     )
 
 
+def dumpyaml_into(data, stream: TextIO):
+    """Write data as YAML to a stream as it is being serialized."""
+    yaml.dump(
+        data,
+        stream,
+        Dumper=Dumper,
+        default_flow_style=False,
+    )
+
+
 def loadyaml(stream):
     return yaml.load(stream, Loader=Loader)
 
 
 def loadyaml_all(stream):
     return yaml.load_all(stream, Loader=Loader)
+
+
+def loadyaml_list(s: str) -> List[Any]:
+    """All documents of a string as a list, as stored by the document cache."""
+    return list(loadyaml_all(s))
+
+
+class Marks(NamedTuple):
+    """Where a mapping or sequence and each of its entries start, as one-based (line, column)."""
+    obj: Union[Dict, List]
+    start: Tuple[int, int]
+    children: Dict[Any, Tuple[int, int]]
+
+
+def _position(mark: yaml.Mark) -> Tuple[int, int]:
+    return mark.line + 1, mark.column + 1
+
+
+class MarkRecorder(yaml.constructor.SafeConstructor):
+    """Constructor for loaders which records `Marks` for every mapping and sequence, keyed by their `id`."""
+
+    def __init__(self):
+        yaml.constructor.SafeConstructor.__init__(self)
+        self.recorded_marks: Dict[int, Marks] = {}
+        self._objects: Dict[yaml.Node, Any] = {}
+
+    def construct_object(self, node, deep=False):
+        result = super().construct_object(node, deep=deep)
+        self._objects[node] = result
+        return result
+
+    def construct_document(self, node):
+        data = super().construct_document(node)
+        for yaml_node, obj in self._objects.items():
+            if yaml_node.start_mark is None:
+                # nodes synthesized by constructors, like the ones for CloudFormation tags
+                continue
+            if isinstance(obj, dict) and isinstance(yaml_node, yaml.MappingNode):
+                children = {}
+                for key_node, value_node in yaml_node.value:
+                    key = self._objects.get(key_node)
+                    try:
+                        if key in obj and value_node.start_mark is not None:
+                            children[key] = _position(value_node.start_mark)
+                    except TypeError:
+                        pass
+            elif isinstance(obj, list) and isinstance(yaml_node, yaml.SequenceNode):
+                children = {
+                    ix: _position(item.start_mark)
+                    for ix, item in enumerate(yaml_node.value)
+                    if item.start_mark is not None
+                }
+            else:
+                continue
+            self.recorded_marks[id(obj)] = Marks(obj, _position(yaml_node.start_mark), children)
+        self._objects = {}
+        return data
+
+
+class MarkingLoader(MarkRecorder, Loader):
+
+    def __init__(self, stream):
+        Loader.__init__(self, stream)
+        MarkRecorder.__init__(self)
+
+
+def loadyaml_all_marked(stream) -> Iterator[Tuple[Any, Dict[int, Marks]]]:
+    """Like `loadyaml_all`, but also return the marks of the mappings and sequences of each document."""
+    loader = MarkingLoader(stream)
+    try:
+        while loader.check_data():
+            yield loader.get_data(), loader.recorded_marks
+    finally:
+        loader.dispose()
@@ -28,3 +28,8 @@ class JinsiTestCase(unittest.TestCase):
         else:
             loaded = load1s(doc, args=args)
         self.assertEqual(expected, loaded)
+
+        for as_json in (True, False):
+            self.assertEqual(
+                list(render_string(doc, as_json=as_json, args=args)),
+                list(render_string(doc, as_json=as_json, args=args, engine="closure")))
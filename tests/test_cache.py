@@ -0,0 +1,70 @@
+import io
+import os
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from jinsi import *
+from jinsi.cache import DocumentCache, get_cache
+
+
+class DocumentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.directory = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_load_hits_cache(self):
+        calls = []
+
+        def loader(text):
+            calls.append(text)
+            return [{'x': text}]
+
+        cache = DocumentCache(self.directory)
+        self.assertEqual([{'x': 'a'}], cache.load('a', loader))
+        self.assertEqual([{'x': 'a'}], DocumentCache(self.directory).load('a', loader))
+        self.assertEqual([{'x': 'b'}], cache.load('b', loader))
+        self.assertEqual(['a', 'b'], calls)
+
+    def test_corrupt_entry_is_replaced(self):
+        cache = DocumentCache(self.directory)
+        cache.load('a', lambda text: [1])
+        for value, garbage in enumerate([b'garbage', b'cno_such_module\nthing\n.', b'\x80\x04K'], start=2):
+            for root, _, files in os.walk(self.directory):
+                for file in files:
+                    with open(os.path.join(root, file), 'wb') as f:
+                        f.write(garbage)
+            self.assertEqual([value], cache.load('a', lambda text: [value]))
+
+    def test_disabled_by_default(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertIsNone(get_cache())
+
+    def test_render_file_uses_cache(self):
+        doc = textwrap.dedent("""\
+            ::let:
+              x: 1
+            value: <<x>> <<$y>>
+            ---
+            other: 2
+        """)
+
+        def _open(path):
+            return io.StringIO(doc)
+
+        with mock.patch.dict(os.environ, {'JINSI_CACHE_DIR': self.directory}):
+            first = list(render_file('template.yaml', args={'y': 'a'}, _open=_open))
+            second = list(render_file('template.yaml', args={'y': 'a'}, _open=_open))
+        self.assertEqual(first, second)
+        self.assertEqual(['value: 1 a\n', 'other: 2\n'], second)
+        entries = [file for _, _, files in os.walk(self.directory) for file in files]
+        self.assertEqual(1, len(entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
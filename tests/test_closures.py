@@ -0,0 +1,150 @@
+import glob
+import pickle
+import textwrap
+import unittest
+from decimal import Decimal
+
+from jinsi import *
+from jinsi.closures import compile_closure
+from jinsi.environment import Environment
+from jinsi.exceptions import NoCaseError, NoSuchVariableError
+from jinsi.nodes import Empty
+from jinsi.parser import Parser
+from jinsi.yamlutil import loadyaml_all
+
+DOCUMENTS = [
+    ("""\
+        ::let:
+          greeting: Hello <<$name>>
+          shout:
+            ::uppercase: <<greeting>>
+        <<$key>>-fixed: value
+        greeting: <<greeting>>
+        shout: <<shout>>
+        <<$key>>: <<$name>>
+        plain: text
+        nested:
+          ::get: $person.address.city
+    """, {'name': 'alice', 'key': 'k', 'person': {'address': {'city': 'Paris'}}}),
+    ("""\
+        ::let:
+          item:
+            name: <<$item.name>>
+            upper:
+              ::uppercase: <<$item.name>>
+        items:
+          ::each $items as $item:
+            ::call: item
+        names:
+          ::each $items as item:
+            - <<item.name>>
+            - ::get: item.name
+        nested:
+          ::each $items as $outer:
+            ::each $items as $inner:
+              <<$outer.name>>-<<$inner.name>>: <<$inner.index>>
+    """, {'items': [{'name': f"item{i}", 'index': i} for i in range(5)]}),
+    ("""\
+        when:
+          ::when: $flag
+          ::then: yes
+          ::else: no
+        case:
+          ::let:
+            x:
+              ::get: $count
+          ::case:
+            x == 1: one
+            x == 2: two
+            _: other
+        match:
+          ::match $color:
+            red: 1
+            blue: 2
+        all:
+          ::all: [$flag, $color]
+        any:
+          ::any: [$missing, $color]
+        else:
+          ::get: $nothing.here
+          ::else: fallback
+        format: <<$color>>/<<$flag>>/literal
+        number: !dec 1.50
+    """, {'flag': True, 'color': 'blue', 'count': 2, 'missing': None, 'nothing': {}}),
+]
+
+
+def _unfolded(text):
+    return [Parser().parse_node(doc, Empty()) for doc in loadyaml_all(textwrap.dedent(text))]
+
+
+class ClosureEngineTest(unittest.TestCase):
+
+    def assertSameResults(self, text, args=None):
+        for as_json in (True, False):
+            self.assertEqual(
+                list(render_string(text, args=args, as_json=as_json)),
+                list(render_string(text, args=args, as_json=as_json, engine="closure")))
+        for numtype in (float, Decimal):
+            self.assertEqual(
+                list(load_string(text, args=args, numtype=numtype)),
+                list(load_string(text, args=args, numtype=numtype, engine="closure")))
+
+    def test_documents(self):
+        for text, args in DOCUMENTS:
+            with self.subTest(text=text):
+                self.assertSameResults(text, args)
+
+    def test_unfolded_documents(self):
+        for text, args in DOCUMENTS:
+            for node in _unfolded(text):
+                with self.subTest(text=text):
+                    self.assertEqual(node.evaluate(Environment(**args)), compile_closure(node)(Environment(**args)))
+
+    def test_examples(self):
+        for path in sorted(glob.glob("examples/*.yaml")):
+            with open(path) as f:
+                text = f.read()
+            with self.subTest(path=path):
+                try:
+                    expected = list(render_string(text, args={'max': 30}))
+                except Exception as exc:
+                    with self.assertRaises(type(exc)):
+                        list(render_string(text, args={'max': 30}, engine="closure"))
+                else:
+                    self.assertEqual(expected, list(render_string(text, args={'max': 30}, engine="closure")))
+
+    def test_recursive_templates(self):
+        with open("examples/fibonacci.yaml") as f:
+            template = compile_string(f.read(), engine="closure")
+        result, = template.load(args={'max': 60})
+        self.assertEqual(956722026041, result['result'][-1])
+
+    def test_errors(self):
+        template = compile_string("value: <<undefined>>", engine="closure")
+        with self.assertRaises(NoSuchVariableError):
+            list(template.evaluate())
+        template = compile_string("""\
+            ::let:
+              x:
+                ::get: $x
+            ::case:
+              x == 1: one
+        """, engine="closure")
+        with self.assertRaises(NoCaseError):
+            list(template.evaluate(args={'x': 2}))
+
+    def test_pickle(self):
+        template = compile_string("value: <<$x>>", engine="closure")
+        self.assertEqual([{'value': '1'}], list(template.evaluate(args={'x': 1})))
+        restored = pickle.loads(pickle.dumps(template))
+        self.assertEqual("closure", restored.engine)
+        self.assertEqual([{'value': '2'}], list(restored.evaluate(args={'x': 2})))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            compile_string("value: 1", engine="jit")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import io
+import os
+import pickle
+import tempfile
+import textwrap
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+from benchmarks.suite import deep_let
+from jinsi import *
+from jinsi.nodes import Each
+from jinsi.parallel import TemplateExecutor
+
+
+class CompileTest(unittest.TestCase):
+    doc = """\
+        ::let:
+          greet: Hello <<$name>>
+        value:
+          ::call: greet
+        ---
+        items:
+          ::each $items as $item:
+            ::uppercase: <<$item>>
+    """
+
+    def test_render_many_times(self):
+        template = compile_string(self.doc)
+        self.assertEqual(2, len(template))
+        self.assertEqual(
+            [{'value': 'Hello Jane'}, {'items': ['A', 'B']}],
+            list(template.load(args={'name': 'Jane', 'items': ['a', 'b']})))
+        self.assertEqual(
+            [{'value': 'Hello Jim'}, {'items': ['C']}],
+            list(template.load(args={'name': 'Jim', 'items': ['c']})))
+
+    def test_render(self):
+        template = compile_string(self.doc)
+        self.assertEqual(
+            ['{"value":"Hello Jane"}', '{"items":["X"]}'],
+            list(template.render(args={'name': 'Jane', 'items': ['x']}, as_json=True)))
+
+    def test_pickle(self):
+        template = compile_string(self.doc)
+        restored = pickle.loads(pickle.dumps(template))
+        args = {'name': 'Jane', 'items': ['a', 'b']}
+        self.assertEqual(list(template.render(args=args)), list(restored.render(args=args)))
+
+    def test_pickle_recursive(self):
+        with open("examples/fibonacci.yaml") as f:
+            template = compile_string(f.read())
+        restored = pickle.loads(pickle.dumps(template))
+        self.assertEqual(list(template.load(args={'max': 20})), list(restored.load(args={'max': 20})))
+
+    def test_pickle_deeply_nested(self):
+        template = compile_string(deep_let(120)[0], locations=True)
+        restored = pickle.loads(pickle.dumps(template))
+        self.assertEqual(list(template.render(args={'x': 'r'})), list(restored.render(args={'x': 'r'})))
+        node = restored.documents[0].body.children['level1']
+        self.assertEqual(template.locate(template.documents[0].body.children['level1']), restored.locate(node))
+
+    def test_compile_file(self):
+        def _open(path):
+            return io.StringIO(textwrap.dedent(self.doc))
+
+        template = compile_file("template.yaml", _open=_open)
+        self.assertEqual("template.yaml", template.source)
+        self.assertEqual([{'value': 'Hello Jim'}, {'items': []}], list(template.load(args={'name': 'Jim', 'items': []})))
+
+    def test_immutable(self):
+        template = compile_string(self.doc)
+        with self.assertRaises(AttributeError):
+            template.documents = ()
+
+    def test_concurrent_rendering(self):
+        template = compile_string("""\
+            ::let:
+              items:
+                ::range_exclusive: [0, 50]
+            values:
+              ::each items as item:
+                ::each $names as $name:
+                  <<$name>>-<<item>>
+        """)
+
+        def render(name):
+            return list(template.load(args={'names': [name, name.upper()]}))
+
+        names = [f"name{i}" for i in range(32)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(render, names))
+        for name, result in zip(names, results):
+            self.assertEqual(
+                [{'values': [[f"{name}-{i}", f"{name.upper()}-{i}"] for i in range(50)]}],
+                result)
+
+    def test_render_many(self):
+        template = compile_string(self.doc)
+        rendered = list(render_many([template, template], args={'name': 'Jane', 'items': ['x']}, workers=2))
+        self.assertEqual(['value: Hello Jane\n', 'items:\n- X\n'] * 2, rendered)
+
+    def test_render_many_documents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"{name}.yaml") for name in ("one", "many")]
+            with open(paths[0], "w") as f:
+                f.write("only: <<$x>>\n")
+            with open(paths[1], "w") as f:
+                f.write("---\n".join(f"doc: {i}\nx: <<$x>>\n" for i in range(5)))
+            expected = [doc for path in paths for doc in render_file(path, args={'x': 'r'})]
+            self.assertEqual(6, len(expected))
+            self.assertEqual(expected, list(render_many(paths, args={'x': 'r'}, workers=2)))
+            self.assertEqual(expected, list(render_many(
+                [compile_file(path) for path in paths], args={'x': 'r'}, workers=2)))
+
+    def test_render_many_nested(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "nested.yaml")
+            with open(path, "w") as f:
+                f.write(deep_let(120)[0])
+            expected = list(render_file(path, args={'x': 'r'}))
+            self.assertEqual(expected, list(render_many([path], args={'x': 'r'}, workers=1)))
+            self.assertEqual(expected, list(render_many([path], args={'x': 'r'}, workers=1, engine="closure")))
+            self.assertEqual(expected, list(render_many([compile_file(path)], args={'x': 'r'}, workers=1)))
+
+    def test_parallel_each(self):
+        template = compile_string("""\
+            values:
+              ::each $outer as outer:
+                ::let:
+                  label: <<$prefix>>-<<outer>>
+                ::each $inner as $i:
+                  ::concat:
+                    - ::call: label
+                    - -<<$i>>
+        """)
+        args = {'prefix': 'p', 'outer': ['a', 'b'], 'inner': [str(i) for i in range(30)]}
+        expected = list(template.load(args=args))
+        self.assertEqual('p-b-29', expected[0]['values'][1][29])
+        with mock.patch.object(Each, 'parallel_threshold', 4), ProcessPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(expected, list(template.load(args=args, executor=executor)))
+
+    def test_parallel_each_in_deeply_nested_template(self):
+        template = compile_string(deep_let(120)[0] + "items:\n  ::each $xs as $i: <<$i>>-<<v0>>\n")
+        args = {'x': 'r', 'xs': [str(i) for i in range(30)]}
+        expected = list(template.load(args=args))
+        self.assertEqual('29-r', expected[0]['items'][29])
+        for executor in (ProcessPoolExecutor(max_workers=2), template.executor(max_workers=2)):
+            with self.subTest(executor=type(executor).__name__):
+                with mock.patch.object(Each, 'parallel_threshold', 4), executor, \
+                        mock.patch.object(executor, 'submit', wraps=executor.submit) as submit:
+                    self.assertEqual(expected, list(template.load(args=args, executor=executor)))
+                self.assertGreater(submit.call_count, 1)
+                if isinstance(executor, TemplateExecutor):
+                    # the workers loaded the template when they started, chunks carry only their entries
+                    for call in submit.call_args_list:
+                        self.assertLess(len(pickle.dumps(call.args[1:])), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -131,3 +131,32 @@ class JinsiEach(JinsiTestCase):
 
         self.check(expected, doc)
 
+    def test_recursive_each_keeps_its_loop_variable(self):
+        doc = """\
+            ::let:
+              walk:
+                ::each $nodes as n:
+                  before: <<n.name>>
+                  children:
+                    ::call walk:
+                      $nodes:
+                        ::get: n.children
+                  after: <<n.name>>
+            tree:
+              ::call walk:
+                $nodes:
+                  - name: a
+                    children:
+                      - name: b
+                        children: []
+        """
+
+        expected = {
+            'tree': [{
+                'before': 'a',
+                'children': [{'before': 'b', 'children': [], 'after': 'b'}],
+                'after': 'a',
+            }]
+        }
+
+        self.check(expected, doc)
@@ -0,0 +1,36 @@
+import unittest
+
+from jinsi.environment import Environment
+from jinsi.exceptions import NoSuchEnvironmentVariableError
+
+
+class EnvironmentTest(unittest.TestCase):
+
+    def test_shadowing(self):
+        env = Environment(a=1, b=2)
+        child = env.with_env({'b': 3, 'c': 4})
+        self.assertEqual((1, 3, 4), (child.get_dyn('a'), child.get_dyn('b'), child.get_dyn('c')))
+        self.assertEqual(2, env.get_dyn('b'))
+        with self.assertRaises(NoSuchEnvironmentVariableError):
+            env.get_dyn('c')
+
+    def test_extending_does_not_copy(self):
+        env = Environment(a=1)
+        child = env.with_env({'b': 2})
+        self.assertIs(env, child.parent)
+        self.assertEqual({'b': 2}, child.dyn)
+        self.assertIs(env.memo, child.memo)
+        self.assertIs(env, env.with_env({}))
+
+    def test_deep_chains_are_flattened(self):
+        env = Environment(a=0)
+        for i in range(Environment.max_depth * 3):
+            env = env.with_env({f"x{i % 5}": i})
+            self.assertLessEqual(env.depth, Environment.max_depth)
+        self.assertEqual(0, env.get_dyn('a'))
+        self.assertEqual(Environment.max_depth * 3 - 1, env.get_dyn(f"x{(Environment.max_depth * 3 - 1) % 5}"))
+        self.assertEqual(6, len(env.bindings()))
+
+
+if __name__ == '__main__':
+    unittest.main()
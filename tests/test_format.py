@@ -0,0 +1,61 @@
+import unittest
+
+from jinsi import compile_string
+from jinsi.nodes import Constant, Empty, Format, GetDyn, GetLet, Object
+from jinsi.parser import Parser
+from .common import JinsiTestCase
+
+
+class FormatParseTest(unittest.TestCase):
+
+    def test_plain_string_is_constant(self):
+        node = Parser().parse_node("no placeholders <<here", Empty())
+        self.assertIsInstance(node, Constant)
+        self.assertEqual("no placeholders <<here", node.value)
+
+    def test_placeholders_are_resolved_once(self):
+        node = Parser().parse_node("<<a.b>> and <<$c>>!", Empty())
+        self.assertIsInstance(node, Format)
+        getter, text, dyn, bang = node.parts
+        self.assertIsInstance(getter, GetLet)
+        self.assertEqual(['a', 'b'], getter.path)
+        self.assertEqual(" and ", text)
+        self.assertIsInstance(dyn, GetDyn)
+        self.assertEqual(['c'], dyn.path)
+        self.assertEqual("!", bang)
+        self.assertIs(node, getter.parent)
+
+    def test_only_keys_with_placeholders_are_formatted(self):
+        node = Parser().parse_node({'plain': '<<$a>>', '<<$b>>': 1, 'x <<y>>': 2, '<<z': 3}, Empty())
+        self.assertIsInstance(node, Object)
+        self.assertEqual({'<<$b>>', 'x <<y>>'}, set(node.formats))
+        self.assertIs(node, node.formats['<<$b>>'].parent)
+
+    def test_static_keys_are_folded(self):
+        template = compile_string("""\
+            ::let:
+              y: why
+            x <<y>>: <<$a>>
+            <<$b>>: <<$a>>
+        """)
+        node, = template.documents
+        self.assertIsInstance(node.body.formats['x <<y>>'], Constant)
+        self.assertIsInstance(node.body.formats['<<$b>>'], Format)
+        self.assertEqual([{'x why': '1', 'bee': '1'}], list(template.evaluate(args={'a': 1, 'b': 'bee'})))
+
+
+class FormatTest(JinsiTestCase):
+
+    def test_format(self):
+        doc = """\
+            ::let:
+              x:
+                y: why
+            adjacent: <<x.y>><<$z>>
+            invalid: <<x y>> <<$z>>
+        """
+        self.check({'adjacent': 'whyzed', 'invalid': '<<x y>> zed'}, doc, args={'z': 'zed'})
+
+
+if __name__ == '__main__':
+    unittest.main()
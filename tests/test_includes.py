@@ -0,0 +1,93 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from jinsi import *
+from jinsi import includes
+from jinsi.exceptions import IncludeCycleError
+from jinsi.includes import IncludeResolver
+
+
+class IncludeResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        os.mkdir(os.path.join(self.dir, "shared"))
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(os.path.join(self.dir, "shared"))
+        self.resolver = IncludeResolver()
+        patch = mock.patch.object(includes, '_resolver', self.resolver)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        existed = os.path.exists(path)
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(content))
+        if existed:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return path
+
+    def test_relative_to_including_file(self):
+        self.write("common.yaml", "common: !dec 1.5\n")
+        self.write("shared/common.yaml", "common: wrong\n")
+        path = self.write("main.yaml", "::include: common.yaml\nmain: 1\n")
+        template = compile_file(path)
+        self.assertEqual([{'main': 1, 'common': Decimal('1.5')}], list(template.evaluate()))
+        self.assertEqual((os.path.join(self.dir, "common.yaml"),), template.includes)
+
+    def test_falls_back_to_search_path_and_working_directory(self):
+        self.write("shared/common.yaml", "common: cwd\n")
+        self.assertEqual(os.path.join(self.dir, "shared", "common.yaml"), self.resolver.resolve("common.yaml"))
+        os.mkdir(os.path.join(self.dir, "lib"))
+        self.write("lib/common.yaml", "common: lib\n")
+        self.resolver.search_path.append(os.path.join(self.dir, "lib"))
+        self.assertEqual(os.path.join(self.dir, "lib", "common.yaml"), self.resolver.resolve("common.yaml"))
+
+    def test_nested_includes_are_expanded(self):
+        self.write("inner.yaml", "inner: 1\n")
+        self.write("outer.yaml", "::include: inner.yaml\nouter:\n  ::include: inner.yaml\n")
+        path = self.write("main.yaml", "::include: outer.yaml\n")
+        template = compile_file(path)
+        self.assertEqual([{'inner': 1, 'outer': {'inner': 1}}], list(template.evaluate()))
+        self.assertEqual(
+            {os.path.join(self.dir, "outer.yaml"), os.path.join(self.dir, "inner.yaml")},
+            set(template.includes))
+
+    def test_cycles_are_detected(self):
+        self.write("a.yaml", "::include: b.yaml\na: 1\n")
+        self.write("b.yaml", "b:\n  ::include: a.yaml\n")
+        with self.assertRaises(IncludeCycleError):
+            compile_file(os.path.join(self.dir, "a.yaml"))
+        path = self.write("main.yaml", "::include: b.yaml\n")
+        with self.assertRaises(IncludeCycleError):
+            compile_file(path)
+
+    def test_files_are_loaded_once_until_modified(self):
+        self.write("common.yaml", "common: [1]\n")
+        first = self.write("first.yaml", "::include: common.yaml\ncommon: [2]\n")
+        second = self.write("second.yaml", "::include: common.yaml\n")
+        with mock.patch.object(includes, 'loadyaml_list', wraps=includes.loadyaml_list) as load:
+            self.assertEqual([{'common': [2, 1]}], list(compile_file(first).evaluate()))
+            self.assertEqual([{'common': [1]}], list(compile_file(second).evaluate()))
+            self.assertEqual(1, load.call_count)
+            self.write("common.yaml", "common: [3]\n")
+            self.assertEqual([{'common': [3]}], list(compile_file(second).evaluate()))
+            self.assertEqual(2, load.call_count)
+
+    def test_missing_include(self):
+        path = self.write("main.yaml", "::include: missing.yaml\n")
+        with self.assertRaises(FileNotFoundError):
+            compile_file(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
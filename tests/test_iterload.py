@@ -0,0 +1,76 @@
+import unittest
+from decimal import Decimal
+
+from jinsi import *
+
+
+class FusedLoadTest(unittest.TestCase):
+    doc = """\
+        ::let:
+          point:
+            x: <<$x>>
+            y: 1.5
+          $scale: 2.5
+        points:
+          ::each $xs as $x:
+            ::when:
+              ::get: $x
+            ::then:
+              ::call: point
+        scale:
+          ::get: $scale
+        total:
+          ::add:
+            - 1.25
+            - ::get: $scale
+    """
+
+    def test_numtype(self):
+        template = compile_string(self.doc)
+        value, = template.load(args={'xs': [1, 2]}, numtype=float)
+        self.assertEqual({'points': [{'x': '1', 'y': 1.5}, {'x': '2', 'y': 1.5}], 'scale': 2.5, 'total': 3.75}, value)
+        self.assertIs(float, type(value['points'][0]['y']))
+        self.assertIs(float, type(value['total']))
+        value, = template.load(args={'xs': [1]}, numtype=Decimal)
+        self.assertIs(Decimal, type(value['points'][0]['y']))
+        self.assertEqual(Decimal('3.75'), value['total'])
+
+    def test_values_are_independent(self):
+        template = compile_string(self.doc)
+        first, = template.load(args={'xs': [1, 1]})
+        first['points'][0]['y'] = 0
+        self.assertEqual(1.5, first['points'][1]['y'])
+        second, = template.load(args={'xs': [1]})
+        self.assertEqual(1.5, second['points'][0]['y'])
+
+
+class IterLoadTest(unittest.TestCase):
+
+    def test_entries_are_evaluated_lazily(self):
+        items, = iterload_string("""\
+            ::let:
+              $greeting: Hello
+            first: <<$greeting>>
+            second:
+              ::get: $missing
+        """)
+        self.assertEqual(('first', 'Hello'), next(items))
+        with self.assertRaises(Exception):
+            next(items)
+
+    def test_sequence(self):
+        items, = iterload_string("""\
+            ::each $xs as $x:
+              ::add:
+                - ::get: $x
+                - 0.5
+        """, args={'xs': [1, 2, 3]})
+        self.assertEqual([1.5, 2.5, 3.5], list(items))
+
+    def test_documents(self):
+        documents = iterload_string("a: 1\n---\n- 2\n- 3\n", numtype=Decimal)
+        self.assertEqual([[('a', Decimal(1))], [Decimal(2), Decimal(3)]], [list(items) for items in documents])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
+import datetime
+import io
 import unittest
 from dataclasses import dataclass
+from decimal import Decimal
+from unittest import mock
 
-from jinsi.jsonutil import dumpjson, loadjson_all
+from jinsi.jsonutil import Encoder, dumpjson, dumpjson_into, loadjson_all
 
 
 class X:
@@ -54,6 +58,44 @@ class JsonDumpTests(unittest.TestCase):
         res = dumpjson(data, encode_dataclasses=False)
         self.assertEqual(dumpjson(str(data)), res)
 
+    def test_dump_into(self):
+        data = {'a': [1, 'abc', {'b': None}], 'z': Z(1, 'quux'), 'x': X(*range(100))}
+        stream = io.StringIO()
+        dumpjson_into(data, stream, buffer_size=16)
+        self.assertEqual(dumpjson(data), stream.getvalue())
+
+    def test_fast_path_matches_python_encoder(self):
+        values = [
+            {'a': [1, 2.5, True, False, None, 'ü', {}, []]},
+            [Decimal('1.10'), Decimal('1.5'), Decimal('-0'), Decimal('3'), Decimal('1E+2'), Decimal('NaN')],
+            [datetime.date(2020, 1, 2), datetime.datetime(2020, 1, 2, 3, 4, 5)],
+            {1: 'x', None: 'y', True: 'z'},
+            {'tuple': (1, 2), 'z': Z(1, 'quux')},
+            [float('inf'), -0.0, 1e100],
+        ]
+        for value in values:
+            for ensure_ascii in (True, False):
+                with self.subTest(value=value, ensure_ascii=ensure_ascii):
+                    expected = "".join(Encoder(ensure_ascii=ensure_ascii).iterencode(value))
+                    self.assertEqual(expected, dumpjson(value, ensure_ascii=ensure_ascii))
+
+    def test_fast_path_with_inexact_decimals(self):
+        value = {'a': [Decimal('1.10'), Decimal('2.0'), Decimal('1E+2'), 'ü"', Decimal('3')], 'b': Decimal('0.5')}
+        for ensure_ascii in (True, False):
+            with self.subTest(ensure_ascii=ensure_ascii):
+                expected = "".join(Encoder(ensure_ascii=ensure_ascii).iterencode(value))
+                with mock.patch('jinsi.jsonutil._make_iterencode', side_effect=AssertionError):
+                    self.assertEqual(expected, dumpjson(value, ensure_ascii=ensure_ascii))
+
+    def test_without_c_speedups(self):
+        value = {'a': [1, 2.5, Decimal('1.10'), 'ü"'], 'b': None}
+        for ensure_ascii in (True, False):
+            with self.subTest(ensure_ascii=ensure_ascii):
+                expected = "".join(Encoder(ensure_ascii=ensure_ascii).iterencode(value))
+                for name in ('c_make_encoder', 'c_encode_basestring', 'c_encode_basestring_ascii'):
+                    with mock.patch(f'jinsi.jsonutil.{name}', None):
+                        self.assertEqual(expected, dumpjson(value, ensure_ascii=ensure_ascii))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import pickle
+import unittest
+
+from jinsi import *
+from jinsi.locations import Location
+from jinsi.nodes import Each, Format
+
+
+class LocationsTest(unittest.TestCase):
+    doc = """\
+        ::let:
+          greet: Hello <<$name>>
+        value:
+          ::call: greet
+        items:
+          ::each $items as $item:
+            - <<$item>>
+            - static
+        ---
+        other: <<$x>>
+    """
+
+    def test_locations(self):
+        template = compile_string(self.doc, locations=True)
+        first, second = template.documents
+        self.assertEqual(Location(None, 1, 1), template.locate(first))
+        self.assertEqual(Location(None, 2, 10), template.locate(first.let['greet']))
+        each = first.body.children['items']
+        self.assertIsInstance(each, Each)
+        self.assertEqual(Location(None, 6, 3), template.locate(each))
+        item, static = each.body.elements
+        self.assertIsInstance(item, Format)
+        self.assertEqual(Location(None, 7, 7), template.locate(item))
+        self.assertEqual(Location(None, 8, 7), template.locate(static))
+        self.assertEqual(Location(None, 10, 8), template.locate(second.children['other']))
+        self.assertEqual(Location(None, 10, 8), template.locate(second.children['other'].parts[0]))
+
+    def test_cloudformation_tags(self):
+        template = compile_string("a: <<$a>>\nref: !Ref Thing\natt: !GetAtt Thing.Arn\n", locations=True)
+        node, = template.documents
+        self.assertEqual(Location(None, 2, 6), template.locate(node.children['ref']))
+        self.assertEqual(Location(None, 3, 6), template.locate(node.children['att']))
+        self.assertEqual({'Fn::GetAtt': ['Thing', 'Arn']}, node.children['att'].value)
+        static, = compile_string("a: 1\n", locations=True).documents
+        self.assertEqual({'a': 1}, static.value)
+
+    def test_file_and_pickle(self):
+        template = compile_file("examples/fibonacci.yaml", locations=True)
+        template = pickle.loads(pickle.dumps(template))
+        node, = template.documents
+        self.assertEqual("examples/fibonacci.yaml:22:3", str(template.locate(node.body.children['result'])))
+
+    def test_disabled_by_default(self):
+        template = compile_string(self.doc)
+        self.assertIsNone(template.locations)
+        self.assertIsNone(template.locate(template.documents[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
+import os
 import re
+import tempfile
 import textwrap
 import unittest
 import io
@@ -70,6 +72,41 @@ class MainTest(unittest.TestCase):
         jinsi_main("-j", "-", _print=capture(res), _open=provide({}), _stdin=io.StringIO("x: 3\n---\ny: 3\n"))
         self.assertEqual("""{"x":3}\n{"y":3}\n""", res.getvalue())
 
+    def test_parallel(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i in range(3):
+                path = os.path.join(directory, f"{i}.yaml")
+                with open(path, 'w') as f:
+                    f.write(f"x: <<$v>>{i}\n---\ny: {i}\n")
+                paths.append(path)
+            res = io.StringIO()
+            jinsi_main("-j", "-P", "2", "v=a", *paths, "-", _print=capture(res), _stdin=io.StringIO("z: 3"))
+        self.assertEqual(
+            """{"x":"a0"}\n{"y":0}\n{"x":"a1"}\n{"y":1}\n{"x":"a2"}\n{"y":2}\n{"z":3}\n""",
+            res.getvalue())
+
+    def test_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.yaml")
+            res = io.StringIO()
+            jinsi_main("-o", path, "-", _print=capture(res), _stdin=io.StringIO("x: 3\n---\ny: 3\n"))
+            with open(path) as f:
+                self.assertEqual("x: 3\n---\ny: 3\n", f.read())
+            jinsi_main("-j", "-o", path, "-", _print=capture(res), _stdin=io.StringIO("x: 3\n---\ny: 3\n"))
+            with open(path) as f:
+                self.assertEqual("""{"x":3}\n{"y":3}\n""", f.read())
+        self.assertEqual("", res.getvalue())
+
+    def test_option_without_value(self):
+        for options in (["-P"], ["-P", "x"], ["-o"], ["--profile-output"]):
+            with self.subTest(options=options):
+                stderr = io.StringIO()
+                with self.assertRaises(SystemExit) as cm:
+                    jinsi_main(*options, _print=self.fail, _stdin=io.StringIO(""), _stderr=stderr)
+                self.assertEqual(2, cm.exception.code)
+                self.assertIn(f"{options[0]} expects", stderr.getvalue())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+from unittest import mock
+
+from jinsi import *
+from jinsi.functions import Functions
+from jinsi.analysis import dependencies
+from jinsi.util import LRUCache
+from .common import JinsiTestCase
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertEqual(2, len(cache))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+
+class DependenciesTest(unittest.TestCase):
+
+    def test_template_dependencies(self):
+        template = compile_string("""\
+            ::let:
+              $bound: 1
+              fib:
+                ::when:
+                  ::get: $n == 0 or $n == 1
+                ::then:
+                  ::get: $n
+                ::else:
+                  ::add:
+                    - ::call fib:
+                        $n:
+                          ::get: $n - 1
+                    - ::call fib:
+                        $n:
+                          ::get: $n - 2
+            value:
+              <<$x>>: <<$bound>>
+              fib:
+                ::call fib:
+                  $n: 10
+        """)
+        node, = template.documents
+        deps = dependencies(node.body)
+        self.assertEqual({'x', 'bound'}, deps.dyn)
+        self.assertEqual({'x'}, dependencies(node).dyn)
+        self.assertEqual({'n'}, dependencies(node.let['fib']).dyn)
+
+    def test_template_dependencies_api(self):
+        template = compile_string("""\
+            ::let:
+              item: <<$prefix>>-
+            items:
+              ::each $items as x:
+                - ::call: item
+                - <<x>>
+            home:
+              ::get: HOME
+            ---
+            other: <<$other>>
+        """)
+        deps = template.dependencies()
+        self.assertEqual({'prefix', 'items', 'other'}, deps.args)
+        self.assertEqual({'HOME'}, deps.env)
+        first, second = template.documents
+        self.assertEqual({'other'}, template.dependencies(second).dyn)
+        each = first.body.children['items']
+        self.assertEqual({'prefix', each}, template.dependencies(each.body).dyn)
+        self.assertEqual({'prefix'}, template.dependencies(each.body).args)
+        self.assertEqual(
+            {'prefix': 'p', 'items': []},
+            template.relevant_args({'prefix': 'p', 'items': [], 'unused': 1}))
+
+
+class MemoizationTest(JinsiTestCase):
+
+    def test_fibonacci(self):
+        with open("examples/fibonacci.yaml") as f:
+            doc = f.read()
+        result = load1s(doc, args={'max': 60})
+        self.assertEqual(956722026041, result['result'][-1])
+
+    def test_unread_arguments_are_ignored(self):
+        doc = """\
+            ::let:
+              name: <<$first>> <<$last>>
+            names:
+              ::each $people as $person:
+                ::call name:
+                  $first: <<$person.first>>
+                  $last: <<$person.last>>
+                  $person: unused
+        """
+        people = [
+            {'first': 'Jane', 'last': 'Doe'},
+            {'first': 'Jim', 'last': 'Doe'},
+            {'first': 'Jane', 'last': 'Doe'},
+        ]
+        self.check({'names': ['Jane Doe', 'Jim Doe', 'Jane Doe']}, doc, args={'people': people})
+
+    def test_shared_results_are_not_mutated(self):
+        doc = """\
+            ::let:
+              base:
+                a:
+                  x: 1
+            one:
+              ::deepmerge:
+                - ::call: base
+                - a:
+                    y: 2
+            two:
+              ::call: base
+        """
+        self.check({'one': {'a': {'x': 1, 'y': 2}}, 'two': {'a': {'x': 1}}}, doc)
+
+    def test_loop_variable_in_template(self):
+        doc = """\
+            ::let:
+              xs: [1, 2]
+            values:
+              ::each xs as x:
+                ::let:
+                  show: <<x>>
+                ::each xs as y:
+                  ::call: show
+        """
+        self.check({'values': [['1', '1'], ['2', '2']]}, doc)
+
+
+class LetMemoizationTest(unittest.TestCase):
+
+    def test_let_is_evaluated_once_per_distinct_input(self):
+        calls = []
+
+        def sha256(value):
+            calls.append(value)
+            return value
+
+        with mock.patch.object(Functions, 'sha256', staticmethod(sha256)):
+            template = compile_string("""\
+                ::let:
+                  salt:
+                    ::sha256: <<$salt>>
+                  item:
+                    ::sha256: <<$i>>
+                values:
+                  ::each $items as $i:
+                    - <<salt>>
+                    - <<salt>>
+                    - <<item>>
+                    - ::get: item
+            """)
+        result, = template.load(args={'salt': 's', 'items': ['a', 'b', 'a']})
+        self.assertEqual({'values': [['s', 's', 'a', 'a'], ['s', 's', 'b', 'b'], ['s', 's', 'a', 'a']]}, result)
+        self.assertEqual(['s', 'a', 'b'], calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from decimal import Decimal
+
+from jinsi import *
+from jinsi.nodes import Constant, Empty, Let, Object
+from jinsi.optimizer import fold_constants
+from jinsi.parser import Parser
+
+
+class ConstantFoldingTest(unittest.TestCase):
+
+    def test_static_document_is_folded(self):
+        node, = compile_string("""\
+            ::let:
+              x: 1
+            value: <<x>>
+            range:
+              ::range_exclusive: [0, 3]
+        """).documents
+        self.assertIsInstance(node, Constant)
+        self.assertEqual({'value': '1', 'range': [0, 1, 2]}, node.value)
+
+    def test_dynamic_parts_are_kept(self):
+        node, = compile_string("""\
+            ::let:
+              x: 1
+            static:
+              value: <<x>>
+            dynamic: <<$y>>
+        """).documents
+        self.assertIsInstance(node, Let)
+        self.assertIsInstance(node.body, Object)
+        self.assertIsInstance(node.body.children['static'], Constant)
+        self.assertNotIsInstance(node.body.children['dynamic'], Constant)
+
+    def test_unused_templates_are_not_evaluated(self):
+        node = Parser().parse_node({
+            '::let': {'unused': {'::range_exclusive': [0, 3]}},
+            'value': '<<$x>>',
+        }, Empty())
+        fold_constants(node)
+        self.assertNotIsInstance(node.let['unused'], Constant)
+
+    def test_failures_are_deferred(self):
+        template = compile_string("""\
+            value:
+              ::when: $x
+              ::then:
+                ::head: [[]]
+        """)
+        self.assertEqual([{'value': None}], list(template.load(args={'x': False})))
+        with self.assertRaises(IndexError):
+            list(template.load(args={'x': True}))
+
+    def test_constants_are_not_modified_by_load(self):
+        template = compile_string("""\
+            value:
+              ::range_exclusive: [0, 2]
+        """)
+        self.assertEqual([{'value': [0.0, 1.0]}], list(template.load()))
+        value, = template.evaluate()
+        self.assertEqual([Decimal(0), Decimal(1)], value['value'])
+        self.assertIsInstance(value['value'][0], Decimal)
+
+    def test_equal_values_are_shared(self):
+        first, second = compile_string("""\
+            a:
+              tags: {team: core, cost: 1}
+              name: <<$a>>
+            b:
+              tags: {team: core, cost: 1}
+              name: <<$b>>
+            ---
+            c:
+              tags: {team: core, cost: 1}
+              name: <<$c>>
+        """).documents
+        tags = first.children['a'].children['tags'].value
+        self.assertIs(tags, first.children['b'].children['tags'].value)
+        self.assertIs(tags, second.children['c'].children['tags'].value)
+        self.assertIsNot(first.children['a'].children['tags'], first.children['b'].children['tags'])
+
+    def test_values_rendering_differently_are_not_shared(self):
+        template = compile_string("""\
+            - [1]
+            - [1.0]
+            - [true]
+            - [1]
+            - !dec 1.0
+            - !dec 1.00
+        """)
+        node, = template.documents
+        value = node.value
+        self.assertEqual(list(template.evaluate()), [value])
+        self.assertEqual([[1], [1.0], [True], [1], Decimal("1.0"), Decimal("1.00")], value)
+        self.assertIs(value[0], value[3])
+        self.assertIsNot(value[0], value[1])
+        self.assertIsNot(value[0], value[2])
+        self.assertEqual("- - 1\n- - 1.0\n- - true\n- - 1\n- 1.0\n- 1.00\n", dumpyaml(value))
+
+    def test_evaluated_values_are_copies(self):
+        template = compile_string("""\
+            a:
+              tags: {env: prod}
+            b: <<$x>>
+        """)
+        value, = template.evaluate(args={'x': 1})
+        value['a']['tags']['env'] = 'HACKED'
+        self.assertEqual(["a:\n  tags:\n    env: prod\nb: '1'\n"], list(template.render(args={'x': 1})))
+        self.assertEqual({'env': 'prod'}, template.documents[0].children['a'].value['tags'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import os
+import tempfile
+import unittest
+
+from jinsi import *
+from jinsi.main import main as jinsi_main
+from jinsi.nodes import Each
+from jinsi.profiler import node_paths
+from .test_main import capture
+
+DOC = """\
+    ::let:
+      item:
+        name: <<$item>>
+    items:
+      ::each $items as $item:
+        ::call: item
+"""
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_node_paths(self):
+        node, = compile_string(DOC).documents
+        paths = node_paths(node, prefix="doc")
+        self.assertEqual("doc/", paths[node])
+        self.assertEqual("doc/::let/item", paths[node.let['item']])
+        each = node.body.children['items']
+        self.assertEqual("doc/items", paths[each])
+        self.assertEqual("doc/items/::each $items as $item", paths[each.body])
+
+    def test_profile(self):
+        template = compile_string(DOC)
+        profiler = template.profiler()
+        value, = template.evaluate(args={'items': ['a', 'b', 'c']}, profiler=profiler)
+        self.assertEqual({'items': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]}, value)
+        each, = (node for node in profiler.stats if isinstance(node, Each))
+        self.assertEqual(1, profiler.stats[each].calls)
+        self.assertEqual("Each <string>#0/items", profiler.labels[each])
+        item = template.documents[0].let['item']
+        self.assertEqual(3, profiler.stats[item].calls)
+        self.assertLessEqual(profiler.stats[item].cumulative, profiler.stats[each].cumulative)
+
+        report = io.StringIO()
+        profiler.report(report)
+        self.assertIn("Each <string>#0/items", report.getvalue())
+        stacks = io.StringIO()
+        profiler.write_stacks(stacks)
+        for line in stacks.getvalue().splitlines():
+            frames, micros = line.rsplit(" ", 1)
+            self.assertTrue(frames.startswith("Let <string>#0/"))
+            self.assertGreaterEqual(int(micros), 0)
+
+    def test_recursion(self):
+        with open("examples/fibonacci.yaml") as f:
+            template = compile_string(f.read())
+        profiler = template.profiler()
+        result, = template.load(args={'max': 20}, profiler=profiler)
+        self.assertEqual(4181, result['result'][-1])
+        fib = template.documents[0].let['fib']
+        total = max(stats.cumulative for stats in profiler.stats.values())
+        self.assertLessEqual(profiler.stats[fib].cumulative, total)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stacks.txt")
+            res = io.StringIO()
+            jinsi_main("--profile-output", path, "items=ab", "-", _print=capture(res), _stdin=io.StringIO(DOC))
+            with open(path) as f:
+                self.assertIn("Let <string>#0/", f.read())
+        self.assertEqual("items:\n- name: a\n- name: b\n", res.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
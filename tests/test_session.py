@@ -0,0 +1,102 @@
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from jinsi import *
+from jinsi.functions import Functions
+from jinsi.session import Change
+
+
+class RenderSessionTest(unittest.TestCase):
+    doc = """\
+        ::let:
+          $host: <<$name>>.<<$domain>>
+          hash:
+            ::sha256: <<$name>>
+        service:
+          host: <<$host>>
+          hash:
+            ::call: hash
+          ports:
+            - ::sha256: <<$port>>
+            - static
+        <<$extra>>: value
+        ---
+        other:
+          ::sha256: <<$other>>
+    """
+
+    def setUp(self):
+        self.calls = []
+
+        def sha256(value):
+            self.calls.append(value)
+            return f"#{value}"
+
+        patch = mock.patch.object(Functions, 'sha256', staticmethod(sha256))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_only_changed_parts_are_evaluated(self):
+        session = RenderSession(compile_string(self.doc))
+        args = {'name': 'api', 'domain': 'example.com', 'port': 80, 'extra': 'x', 'other': 'o'}
+        first = session.evaluate(args)
+        self.assertEqual([
+            {
+                'service': {'host': 'api.example.com', 'hash': '#api', 'ports': ['#80', 'static']},
+                'x': 'value',
+            },
+            {'other': '#o'},
+        ], first)
+        self.assertEqual(['api', '80', 'o'], self.calls)
+        self.calls.clear()
+
+        second = session.evaluate(dict(args, port=443))
+        self.assertEqual(['443'], self.calls)
+        self.assertEqual('#443', second[0]['service']['ports'][0])
+        self.assertEqual(first[1], second[1])
+        self.assertEqual([Change(0, ('service', 'ports', 0), '#80', '#443')], session.changes)
+        self.calls.clear()
+
+        third = session.evaluate(dict(args, domain='example.org', port=443))
+        self.assertEqual([], self.calls)
+        self.assertEqual('api.example.org', third[0]['service']['host'])
+        self.assertEqual([Change(0, ('service', 'host'), 'api.example.com', 'api.example.org')], session.changes)
+
+    def test_same_as_full_render(self):
+        template = compile_string(self.doc)
+        session = RenderSession(template)
+        for args in [
+            {'name': 'a', 'domain': 'd', 'port': 1, 'extra': 'x', 'other': 'o'},
+            {'name': 'b', 'domain': 'd', 'port': 1, 'extra': 'y', 'other': 'o'},
+            {'name': 'b', 'domain': 'e', 'port': 2, 'extra': 'y', 'other': 'p'},
+            {'name': 'a', 'domain': 'd', 'port': 1, 'extra': 'x', 'other': 'o'},
+        ]:
+            self.assertEqual(list(template.render(args=args)), session.render(args))
+
+    def test_evaluated_values_are_copies(self):
+        session = RenderSession(compile_string(self.doc))
+        args = {'name': 'api', 'domain': 'example.com', 'port': 80, 'extra': 'x', 'other': 'o'}
+        first = session.evaluate(args)
+        first[0]['service']['ports'].append('HACKED')
+        first[1]['other'] = 'HACKED'
+        self.assertEqual(list(compile_string(self.doc).render(args=args)), session.render(dict(args, port=80)))
+        self.assertNotIn('HACKED', session.evaluate(dict(args, port=443))[0]['service']['ports'])
+
+    def test_equal_args_which_render_differently(self):
+        template = compile_string("""\
+            ::let:
+              $y: <<$x>>
+            a: <<$x>>
+            b:
+              ::get: $x
+            c: <<$y>>
+        """)
+        session = RenderSession(template)
+        for x in [1, True, 1.0, Decimal('1.0'), Decimal('1.00'), 1]:
+            with self.subTest(x=x):
+                self.assertEqual(list(template.render(args={'x': x})), session.render({'x': x}))
+
+
+if __name__ == '__main__':
+    unittest.main()
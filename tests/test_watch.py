@@ -0,0 +1,136 @@
+import io
+import os
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from jinsi.main import main
+from jinsi.watch import Watcher
+
+
+class WatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.included = self.write("included.yaml", "greeting: hello\n")
+        self.main = self.write("main.yaml", f"""\
+            ::include: {self.included}
+            value: 1
+        """)
+        self.other = self.write("other.yaml", "other: 1\n")
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        existed = os.path.exists(path)
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(content))
+        if existed:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return path
+
+    def render(self, watcher, path):
+        return list(watcher.templates[path].evaluate())
+
+    def test_includes_are_recorded(self):
+        watcher = Watcher([self.main, self.other])
+        self.assertEqual((self.included,), watcher.templates[self.main].includes)
+        self.assertEqual((), watcher.templates[self.other].includes)
+        self.assertEqual({self.main, self.other, self.included}, set(watcher.files()))
+
+    def test_unchanged_files_are_not_recompiled(self):
+        watcher = Watcher([self.main, self.other])
+        self.assertEqual([], watcher.poll())
+
+    def test_changed_include_recompiles_dependents_only(self):
+        watcher = Watcher([self.main, self.other])
+        other = watcher.templates[self.other]
+        self.write("included.yaml", "greeting: hi\n")
+        self.assertEqual([self.main], watcher.poll())
+        self.assertEqual([{'value': 1, 'greeting': 'hi'}], self.render(watcher, self.main))
+        self.assertIs(other, watcher.templates[self.other])
+
+    def test_errors_keep_previous_template(self):
+        watcher = Watcher([self.other])
+        self.write("other.yaml", "other: [1\n")
+        self.assertEqual([self.other], watcher.poll())
+        self.assertIn(self.other, watcher.errors)
+        self.assertEqual([{'other': 1}], self.render(watcher, self.other))
+        self.write("other.yaml", "other: 2\n")
+        self.assertEqual([self.other], watcher.poll())
+        self.assertNotIn(self.other, watcher.errors)
+        self.assertEqual([{'other': 2}], self.render(watcher, self.other))
+
+    def test_cli_renders_again_on_change(self):
+        printed = []
+        polls = []
+
+        def sleep(_seconds):
+            polls.append(None)
+            if len(polls) == 1:
+                self.write("included.yaml", "greeting: hi\n")
+            elif len(polls) > 2:
+                raise KeyboardInterrupt
+
+        stderr = io.StringIO()
+        with mock.patch('jinsi.main.time.sleep', sleep):
+            main("-j", "-w", self.main, self.other, _print=printed.append, _stderr=stderr)
+        self.assertEqual([
+            '{"value":1,"greeting":"hello"}',
+            '{"other":1}',
+            '{"value":1,"greeting":"hi"}',
+        ], printed)
+        self.assertRegex(stderr.getvalue(), r"^rebuilt .*main\.yaml in [0-9.]+ ms\n$")
+
+    def test_cli_skips_files_which_fail_to_compile(self):
+        printed = []
+        polls = []
+
+        def sleep(_seconds):
+            polls.append(None)
+            if len(polls) == 1:
+                self.write("other.yaml", "other: [1\n")
+            elif len(polls) == 2:
+                self.write("other.yaml", "other: 2\n")
+            else:
+                raise KeyboardInterrupt
+
+        stderr = io.StringIO()
+        with mock.patch('jinsi.main.time.sleep', sleep):
+            main("-j", "-w", self.other, _print=printed.append, _stderr=stderr)
+        self.assertEqual(['{"other":1}', '{"other":2}'], printed)
+        self.assertTrue(stderr.getvalue().startswith(f"error: {self.other}: "), stderr.getvalue())
+        self.assertRegex(stderr.getvalue(), r"\nrebuilt .*other\.yaml in [0-9.]+ ms\n$")
+        self.assertEqual(1, stderr.getvalue().count("rebuilt"))
+
+    def test_cli_rewrites_output_file(self):
+        output = os.path.join(self.dir, "out.jsonl")
+        polls = []
+
+        def sleep(_seconds):
+            polls.append(None)
+            if len(polls) == 1:
+                self.write("other.yaml", "other: 2\n")
+            else:
+                raise KeyboardInterrupt
+
+        with mock.patch('jinsi.main.time.sleep', sleep):
+            main("-j", "-w", "-o", output, self.main, self.other, _stderr=io.StringIO())
+        with open(output) as f:
+            self.assertEqual('{"value":1,"greeting":"hello"}\n{"other":2}\n', f.read())
+
+    def test_cli_rejects_parallel_and_profile(self):
+        for options in (["-P", "2"], ["--profile"], ["--profile-output", "out.txt"]):
+            with self.subTest(options=options):
+                stderr = io.StringIO()
+                with self.assertRaises(SystemExit) as cm:
+                    main("-w", *options, self.main, _print=self.fail, _stderr=stderr)
+                self.assertEqual(2, cm.exception.code)
+                self.assertIn("--watch can not be combined", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,114 @@
+import glob
 import textwrap
 import unittest
+from decimal import Decimal
 
-from jinsi.yamlutil import dumpyaml
+import yaml
+
+from jinsi import yamlutil
+from jinsi.yamlutil import MarkRecorder, Marks, dumpyaml
+
+DOCUMENTS = [
+    "x: 3",
+    "x: 3\n---\ny: 3\n",
+    "a: 1.5\nb: -2\nc: +3.25e+10\nd: 007\ne: .5\nf: 1e5\n",
+    "a: yes\nb: no\nc: ~\nd: null\ne: true\nf: 2020-01-02\ng: '12'\n",
+    "text: |\n  line one\n  line two\nfolded: >\n  folded\n  text\n",
+    "unicode: Grüße, 世界 ✓\nescaped: \"tab\\tnewline\\n\"\n",
+    "base: &base\n  a: 1\nderived:\n  <<: *base\n  b: 2\n",
+    "flow: {a: [1, 2, {b: c}], 'd': \"e\"}\n",
+    "ref: !Ref Thing\natt: !GetAtt Thing.Arn\nattl: !GetAtt [Thing, Arn]\nsub: !Sub '${AWS::Region}'\n",
+    "join: !Join [',', [a, b]]\nif: !If [Cond, 1, 2.5]\ncond: !Condition IsProd\nb64: !Base64 {Ref: x}\n",
+    "? complex key\n: value\n'::each $xs as $x': <<$x>>\n",
+    "- 1\n- - 2\n  - 3\n- {}\n- []\n- ''\n",
+]
+
+VALUES = [
+    {'xyz': 123, 'abc': 789},
+    {'text': "multi\nline\nstring", 'trailing': "newline\n", 'empty': ""},
+    {'dec': Decimal('1.50'), 'int': Decimal('10'), 'exp': Decimal('1E+2'), 'float': 2.5},
+    {'unicode': "Grüße, 世界", 'quote': "it's \"quoted\"", 'colon': "a: b", 'hash': "# no comment"},
+    [None, True, False, 'yes', 'no', '0123', '1.0', '', [], {}],
+    {'nested': [{'a': [1, {'b': [2, 3]}]}, "x" * 200], 'long': "word " * 50},
+]
+
+
+def _files():
+    return sorted(glob.glob("examples/**/*.yaml", recursive=True))
+
+
+@unittest.skipUnless(yaml.__with_libyaml__, "libyaml is not available")
+class YamlConformanceTest(unittest.TestCase):
+
+    def test_default_is_libyaml(self):
+        self.assertIs(yamlutil.CLoader, yamlutil.Loader)
+        self.assertIs(yamlutil.CDumper, yamlutil.Dumper)
+
+    def check_load(self, text: str):
+        expected = list(yaml.load_all(text, Loader=yamlutil.PyLoader))
+        actual = list(yaml.load_all(text, Loader=yamlutil.CLoader))
+        self.assertEqual(expected, actual)
+        self.assertEqual([type(v) for v in expected], [type(v) for v in actual])
+
+    def test_load_documents(self):
+        for text in DOCUMENTS:
+            with self.subTest(text=text):
+                self.check_load(text)
+
+    def test_load_examples(self):
+        for path in _files():
+            with self.subTest(path=path):
+                with open(path) as f:
+                    self.check_load(f.read())
+
+    def check_dump(self, value):
+        expected = yaml.dump(value, Dumper=yamlutil.PyDumper, default_flow_style=False)
+        actual = yaml.dump(value, Dumper=yamlutil.CDumper, default_flow_style=False)
+        self.assertEqual(expected, actual)
+
+    def test_dump_values(self):
+        for value in VALUES:
+            with self.subTest(value=value):
+                self.check_dump(value)
+
+    def test_dump_documents(self):
+        for text in DOCUMENTS:
+            for value in yaml.load_all(text, Loader=yamlutil.PyLoader):
+                with self.subTest(value=value):
+                    self.check_dump(value)
+
+    def test_dump_examples(self):
+        for path in _files():
+            with open(path) as f:
+                for value in yaml.load_all(f.read(), Loader=yamlutil.PyLoader):
+                    with self.subTest(path=path):
+                        self.check_dump(value)
+
+
+class PyMarkingLoader(MarkRecorder, yamlutil.PyLoader):
+
+    def __init__(self, stream):
+        yamlutil.PyLoader.__init__(self, stream)
+        MarkRecorder.__init__(self)
+
+
+class MarkRecorderTest(unittest.TestCase):
+
+    def test_pure_python_loader(self):
+        text = "a:\n  b: [1, 2]\n  c: 3\n---\n- x\n- {y: 1}\n"
+        loader = PyMarkingLoader(text)
+        try:
+            docs = []
+            while loader.check_data():
+                docs.append((loader.get_data(), dict(loader.recorded_marks)))
+        finally:
+            loader.dispose()
+        self.assertEqual([{'a': {'b': [1, 2], 'c': 3}}, ['x', {'y': 1}]], [doc for doc, _ in docs])
+        first, marks = docs[0]
+        self.assertEqual(Marks(first['a'], (2, 3), {'b': (2, 6), 'c': (3, 6)}), marks[id(first['a'])])
+        self.assertEqual(Marks(first['a']['b'], (2, 6), {0: (2, 7), 1: (2, 10)}), marks[id(first['a']['b'])])
+        second, marks = docs[1]
+        self.assertEqual({0: (5, 3), 1: (6, 3)}, marks[id(second)].children)
 
 
 class YamlDumpTest(unittest.TestCase):
@@ -15,6 +122,10 @@ class YamlDumpTest(unittest.TestCase):
             "abc": 789,
         }))
 
+    def test_dump_decimals(self):
+        values = [Decimal('1.50'), Decimal('10'), Decimal('1E+2'), Decimal('1.5E-3'), Decimal('-Infinity')]
+        self.assertEqual("- 1.50\n- 10\n- 100\n- 0.0015\n- -.inf\n", dumpyaml(values))
+
 
 if __name__ == '__main__':
     unittest.main()